@@ -63,6 +63,7 @@ class Settings(BaseSettings):
     cost_tracking_enabled: bool = Field(default=True, alias="FEATURE_COST_TRACKING")
     cost_management_scope: Optional[str] = Field(default=None, alias="COST_MANAGEMENT_SCOPE")
     cost_refresh_interval: int = Field(default=3600, alias="COST_REFRESH_INTERVAL")
+    cost_cache_ttl_seconds: int = Field(default=180, alias="COST_CACHE_TTL_SECONDS")
     
     # Azure Communication Services
     communication_services_connection_string: Optional[str] = Field(
@@ -71,6 +72,15 @@ class Settings(BaseSettings):
     notification_default_sender: str = Field(
         default="noreply@example.com", alias="NOTIFICATION_DEFAULT_SENDER"
     )
+    azure_communication_service_endpoint: Optional[str] = Field(
+        default=None, alias="AZURE_COMMUNICATION_SERVICE_ENDPOINT"
+    )
+    notification_sender_email: Optional[str] = Field(
+        default=None, alias="NOTIFICATION_SENDER_EMAIL"
+    )
+    notification_sender_phone: Optional[str] = Field(
+        default=None, alias="NOTIFICATION_SENDER_PHONE"
+    )
     
     # FoundryIQ configuration
     foundry_api_base: str = Field(
@@ -171,7 +181,8 @@ def get_default_config() -> Dict[str, Any]:
     return load_yaml_config(settings.default_config_file)
 
 
+@lru_cache(maxsize=1)
 def get_tenants_config() -> Dict[str, Any]:
-    """Load tenants configuration from YAML file."""
+    """Load tenants configuration from YAML file (cached; treat as read-only)."""
     settings = get_settings()
     return load_yaml_config(settings.tenants_config_file)
@@ -51,6 +51,9 @@ async def lifespan(app: FastAPI):
     tenant_manager = get_tenant_manager(settings)
     await tenant_manager.initialize()
     
+    # One Key Vault client (and connection pool) for everything that needs it
+    app.state.kv_client = tenant_manager.kv_client
+    
     # Initialize all services
     logger.info("Initializing services")
     
@@ -81,9 +84,16 @@ async def lifespan(app: FastAPI):
     
     # Initialize tenants from config
     logger.info("Initializing tenants from configuration")
-    init_result = await init_tenants_from_config(settings)
+    init_result = await init_tenants_from_config(settings, kv_client=app.state.kv_client)
     logger.info(f"Tenant initialization: {init_result.get('status')}")
     
+    # The registry was loaded before seeding; reload it so new tenants are visible
+    if init_result.get("results", {}).get("created"):
+        try:
+            await tenant_manager.refresh_registry()
+        except Exception as e:
+            logger.error(f"Failed to refresh tenant registry after seeding: {e}")
+    
     # Run auto-discovery if enabled
     if settings.feature_auto_discovery:
         logger.info("Running data source auto-discovery")
@@ -100,6 +110,9 @@ async def lifespan(app: FastAPI):
     # Close all services
     await rate_limiter.close()
     await foundry_client.close()
+    await branding_service.close()
+    await notification_service.close()
+    await tenant_manager.close()
     logger.info("All services closed")
 
 
@@ -3,9 +3,9 @@ Pydantic models for cost tracking and budget management.
 """
 from datetime import datetime
 from decimal import Decimal
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 from .tenant import BudgetEnforcement
 
@@ -27,6 +27,29 @@ class TenantCost(BaseModel):
     currency: str = "USD"
     breakdowns: List[CostBreakdown] = Field(default_factory=list)
     tags: Dict[str, str] = Field(default_factory=dict)
+    
+    # field name -> (datetime that was formatted, its ISO string)
+    _iso_cache: Dict[str, Tuple[datetime, str]] = PrivateAttr(default_factory=dict)
+    
+    def _iso(self, field: str) -> str:
+        """Format a datetime field, reusing the last result while the field is unchanged."""
+        value = getattr(self, field)
+        cached = self._iso_cache.get(field)
+        # Identity check so assignment and model_copy(update=...) are picked up
+        if cached is None or cached[0] is not value:
+            cached = (value, value.isoformat())
+            self._iso_cache[field] = cached
+        return cached[1]
+    
+    @property
+    def period_start_iso(self) -> str:
+        """ISO-formatted period start."""
+        return self._iso("period_start")
+    
+    @property
+    def period_end_iso(self) -> str:
+        """ISO-formatted period end."""
+        return self._iso("period_end")
 
 
 class Budget(BaseModel):
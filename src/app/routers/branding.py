@@ -106,14 +106,12 @@ async def upload_logo(
         if not file.content_type or not file.content_type.startswith("image/"):
             raise HTTPException(status_code=400, detail="File must be an image")
         
-        # Read file data
-        logo_data = await file.read()
-        
-        # Upload to storage
+        # Upload to storage, streaming from the spooled upload file
         logo_url = await service.upload_logo(
             tenant_id=tenant_id,
-            logo_data=logo_data,
-            filename=file.filename or "logo.png"
+            logo_data=file.file,
+            filename=file.filename or "logo.png",
+            length=file.size
         )
         
         if not logo_url:
@@ -147,14 +145,12 @@ async def upload_brand_guide(
         if file.content_type != "application/pdf":
             raise HTTPException(status_code=400, detail="File must be a PDF")
         
-        # Read file data
-        guide_data = await file.read()
-        
-        # Upload to storage
+        # Upload to storage, streaming from the spooled upload file
         guide_url = await service.upload_brand_guide(
             tenant_id=tenant_id,
-            guide_data=guide_data,
-            filename=file.filename or "brand-guide.pdf"
+            guide_data=file.file,
+            filename=file.filename or "brand-guide.pdf",
+            length=file.size
         )
         
         if not guide_url:
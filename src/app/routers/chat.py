@@ -68,8 +68,8 @@ async def send_chat_message(
     """
     start_time = time.time()
     
-    # Check rate limits
-    allowed, reason = await limiter.check_rate_limit(
+    # Check rate limits and record the request
+    allowed, reason = await limiter.check_and_record(
         tenant_id=tenant_id,
         rpm_limit=tenant_config.rate_limit_rpm,
         rpd_limit=tenant_config.rate_limit_rpd,
@@ -82,14 +82,6 @@ async def send_chat_message(
             detail=reason
         )
     
-    # Record the request
-    await limiter.record_request(
-        tenant_id=tenant_id,
-        rpm_limit=tenant_config.rate_limit_rpm,
-        rpd_limit=tenant_config.rate_limit_rpd,
-        monthly_limit=tenant_config.quota_monthly_requests if hasattr(tenant_config, 'quota_monthly_requests') else None
-    )
-    
     # Generate conversation ID if not provided
     conversation_id = request.conversation_id or str(uuid.uuid4())
     
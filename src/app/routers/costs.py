@@ -49,8 +49,8 @@ async def get_tenant_costs(
         
         return {
             "tenant_id": costs.tenant_id,
-            "period_start": costs.period_start.isoformat(),
-            "period_end": costs.period_end.isoformat(),
+            "period_start": costs.period_start_iso,
+            "period_end": costs.period_end_iso,
             "total_cost": float(costs.total_cost),
             "currency": costs.currency,
             "breakdown": [
@@ -119,8 +119,8 @@ async def get_cost_summary(
         return {
             "tenant_id": tenant_id,
             "current_period": {
-                "start": costs.period_start.isoformat(),
-                "end": costs.period_end.isoformat(),
+                "start": costs.period_start_iso,
+                "end": costs.period_end_iso,
                 "total_cost": float(costs.total_cost),
                 "daily_average": float(daily_avg),
                 "currency": costs.currency
@@ -0,0 +1,36 @@
+"""
+Shared Azure credential for all Azure SDK clients.
+"""
+import logging
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from azure.identity import DefaultAzureCredential
+
+logger = logging.getLogger(__name__)
+
+
+_credential: Optional["DefaultAzureCredential"] = None
+
+
+def get_credential() -> "DefaultAzureCredential":
+    """
+    Get the process-wide Azure credential, creating it on first use.
+
+    Sharing one credential means its token cache is shared too, so the
+    credential chain is only probed once per process rather than once per client.
+
+    Returns:
+        Shared DefaultAzureCredential instance
+    """
+    global _credential
+    if _credential is None:
+        # Imported on first use so mock mode never loads the identity stack
+        from azure.identity import DefaultAzureCredential
+        
+        _credential = DefaultAzureCredential(
+            exclude_shared_token_cache_credential=True,
+            exclude_visual_studio_code_credential=True
+        )
+        logger.debug("Created shared Azure credential")
+    return _credential
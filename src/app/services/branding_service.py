@@ -2,24 +2,77 @@
 Branding service for managing white-label customization.
 Handles brand assets (logos, colors, themes) with Azure Blob Storage.
 """
+import asyncio
 import logging
-from typing import Optional, Dict
-import json
+import random
+from collections import Counter
+from typing import IO, Optional, Dict, List, Union
 from io import BytesIO
 
-from azure.identity import DefaultAzureCredential
 from azure.storage.blob import BlobServiceClient, ContentSettings
 from azure.core.exceptions import ResourceNotFoundError
 
 from ..config import Settings
 from ..models.tenant import BrandingConfig, GlobalBranding
+from .azure_auth import get_credential
 
 logger = logging.getLogger(__name__)
 
+# Logo content types keyed by lower-cased file extension
+_CONTENT_TYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "svg": "image/svg+xml",
+    "webp": "image/webp",
+}
+
+# Parallel block uploads per asset; the SDK chunks large payloads into blocks
+UPLOAD_MAX_CONCURRENCY = 4
+
+# How often the in-memory copy of the global branding is refreshed
+GLOBAL_BRANDING_REFRESH_SECONDS = 60
+
+# Background refresh of the most frequently read tenant brandings
+HOT_TENANT_REFRESH_SECONDS = 30
+HOT_TENANT_REFRESH_JITTER_SECONDS = 5.0
+HOT_TENANT_LIMIT = 100
+
 
 class BrandingService:
     """Service for managing tenant branding and white-label customization."""
     
+    # Tenant fields that fall back to the global branding when not overridden
+    _INHERITED_FIELDS = (
+        "primary_color",
+        "secondary_color",
+        "accent_color",
+        "font_family",
+        "logo_url",
+        "favicon_url",
+    )
+    
+    # Default tenant branding, shared by every tenant without overrides.
+    # Treat as read-only; use model_copy() to derive a modified config.
+    _DEFAULT_TENANT_BRANDING = BrandingConfig(
+        logo_url=None,
+        primary_color=None,
+        secondary_color=None,
+        accent_color=None,
+        font_family=None,
+        custom_css=None,
+        inherit_global=True
+    )
+    
+    # Shared content settings, reused across uploads instead of rebuilt per call
+    _CS_JSON = ContentSettings(content_type="application/json")
+    _CS_PDF = ContentSettings(content_type="application/pdf")
+    _CS_OCTET_STREAM = ContentSettings(content_type="application/octet-stream")
+    _CS_BY_EXT = {
+        ext: ContentSettings(content_type=content_type)
+        for ext, content_type in _CONTENT_TYPES.items()
+    }
+    
     def __init__(self, settings: Settings):
         """Initialize branding service."""
         self.settings = settings
@@ -27,15 +80,19 @@ class BrandingService:
         self.container_name = "branding"
         self._mock_mode = settings.local_mock_services
         self._cache: Dict[str, BrandingConfig] = {}
+        self._global: Optional[GlobalBranding] = None
+        self._access_counts: Counter = Counter()
+        self._background_tasks: List[asyncio.Task] = []
     
     async def initialize(self) -> None:
         """Initialize Azure Blob Storage client."""
         if self._mock_mode or not self.settings.azure_storage_account_url:
             logger.warning("Branding service running in mock mode")
+            self._global = self._get_default_branding()
             return
         
         try:
-            credential = DefaultAzureCredential()
+            credential = get_credential()
             self.blob_service_client = BlobServiceClient(
                 account_url=self.settings.azure_storage_account_url,
                 credential=credential
@@ -47,12 +104,46 @@ class BrandingService:
                 container_client.get_container_properties()
             except ResourceNotFoundError:
                 container_client = self.blob_service_client.create_container(self.container_name)
-                logger.info(f"Created branding container: {self.container_name}")
+                logger.info("Created branding container: %s", self.container_name)
+            
+            # Prefetch global branding once; tenants inherit from the in-memory copy
+            self._global = await self.get_global_branding()
+            self._background_tasks = [
+                asyncio.create_task(self._refresh_global_loop()),
+                asyncio.create_task(self._refresh_hot_tenants_loop()),
+            ]
             
             logger.info("Branding service initialized")
             
         except Exception as e:
-            logger.error(f"Failed to initialize branding service: {e}")
+            logger.error("Failed to initialize branding service: %s", e)
+    
+    async def _refresh_global_loop(self) -> None:
+        """Periodically refresh the cached global branding."""
+        while True:
+            await asyncio.sleep(GLOBAL_BRANDING_REFRESH_SECONDS)
+            # Keep the last good copy if the blob could not be read
+            branding = await self._load_global_branding()
+            if branding is not None:
+                self._global = branding
+    
+    async def _refresh_hot_tenants_loop(self) -> None:
+        """Periodically reload branding for the most frequently read tenants."""
+        while True:
+            await asyncio.sleep(HOT_TENANT_REFRESH_SECONDS)
+            hot_tenants = [tenant_id for tenant_id, _ in self._access_counts.most_common(HOT_TENANT_LIMIT)]
+            
+            # Halve access counts so tenants that go quiet drop out of the hot set
+            self._access_counts = Counter(
+                {tenant_id: count // 2 for tenant_id, count in self._access_counts.items() if count > 1}
+            )
+            
+            await asyncio.gather(*(self._refresh_tenant_branding(t) for t in hot_tenants))
+    
+    async def _refresh_tenant_branding(self, tenant_id: str) -> None:
+        """Reload one tenant's branding after a random delay to spread blob reads."""
+        await asyncio.sleep(random.uniform(0, HOT_TENANT_REFRESH_JITTER_SECONDS))
+        await self._load_tenant_branding(tenant_id)
     
     async def get_global_branding(self) -> GlobalBranding:
         """
@@ -64,23 +155,23 @@ class BrandingService:
         if self._mock_mode or not self.blob_service_client:
             return self._get_default_branding()
         
+        branding = await self._load_global_branding()
+        return branding if branding is not None else self._get_default_branding()
+    
+    async def _load_global_branding(self) -> Optional[GlobalBranding]:
+        """Load global branding from blob storage (defaults if not found, None on error)."""
         try:
-            blob_client = self.blob_service_client.get_blob_client(
-                container=self.container_name,
-                blob="global-branding.json"
-            )
-            
-            data = blob_client.download_blob().readall()
-            config_dict = json.loads(data)
+            data = await asyncio.to_thread(self._download_blob, "global-branding.json")
             
-            return GlobalBranding(**config_dict)
+            # Parse and validate in one pass (pydantic-core JSON parser)
+            return GlobalBranding.model_validate_json(data)
             
         except ResourceNotFoundError:
             logger.info("Global branding not found, using defaults")
             return self._get_default_branding()
         except Exception as e:
-            logger.error(f"Failed to load global branding: {e}")
-            return self._get_default_branding()
+            logger.error("Failed to load global branding: %s", e)
+            return None
     
     async def set_global_branding(self, branding: GlobalBranding) -> bool:
         """
@@ -94,6 +185,7 @@ class BrandingService:
         """
         if self._mock_mode or not self.blob_service_client:
             logger.info("[MOCK] Global branding updated")
+            self._global = branding
             return True
         
         try:
@@ -102,18 +194,21 @@ class BrandingService:
                 blob="global-branding.json"
             )
             
-            data = json.dumps(branding.model_dump(), indent=2)
-            blob_client.upload_blob(
+            data = branding.model_dump_json(indent=2)
+            await asyncio.to_thread(
+                blob_client.upload_blob,
                 data,
                 overwrite=True,
-                content_settings=ContentSettings(content_type="application/json")
+                content_settings=self._CS_JSON
             )
             
+            self._global = branding
+            
             logger.info("Global branding updated")
             return True
             
         except Exception as e:
-            logger.error(f"Failed to set global branding: {e}")
+            logger.error("Failed to set global branding: %s", e)
             return False
     
     async def get_tenant_branding(self, tenant_id: str) -> BrandingConfig:
@@ -127,6 +222,10 @@ class BrandingService:
         Returns:
             BrandingConfig object
         """
+        # Track reads so hot tenants can be refreshed in the background
+        if self.blob_service_client:
+            self._access_counts[tenant_id] += 1
+        
         # Check cache
         if tenant_id in self._cache:
             return self._cache[tenant_id]
@@ -134,16 +233,28 @@ class BrandingService:
         if self._mock_mode or not self.blob_service_client:
             return self._get_default_tenant_branding(tenant_id)
         
+        branding = await self._load_tenant_branding(tenant_id)
+        if branding is None:
+            return self._get_default_tenant_branding(tenant_id)
+        return branding
+    
+    def _download_blob(self, blob_name: str) -> bytes:
+        """Download a blob's content (blocking; run via asyncio.to_thread)."""
+        blob_client = self.blob_service_client.get_blob_client(
+            container=self.container_name,
+            blob=blob_name
+        )
+        return blob_client.download_blob().readall()
+    
+    async def _load_tenant_branding(self, tenant_id: str) -> Optional[BrandingConfig]:
+        """Load tenant branding from blob storage into the cache (None on failure)."""
         try:
-            blob_client = self.blob_service_client.get_blob_client(
-                container=self.container_name,
-                blob=f"tenants/{tenant_id}/branding.json"
+            data = await asyncio.to_thread(
+                self._download_blob, f"tenants/{tenant_id}/branding.json"
             )
             
-            data = blob_client.download_blob().readall()
-            config_dict = json.loads(data)
-            
-            branding = BrandingConfig(**config_dict)
+            # Parse and validate in one pass (pydantic-core JSON parser)
+            branding = BrandingConfig.model_validate_json(data)
             self._cache[tenant_id] = branding
             
             return branding
@@ -154,8 +265,31 @@ class BrandingService:
             self._cache[tenant_id] = branding
             return branding
         except Exception as e:
-            logger.error(f"Failed to load tenant branding for {tenant_id}: {e}")
-            return self._get_default_tenant_branding(tenant_id)
+            logger.error("Failed to load tenant branding for %s: %s", tenant_id, e)
+            return None
+    
+    async def get_effective_branding(self, tenant_id: str) -> BrandingConfig:
+        """
+        Get tenant branding with global defaults applied.
+        Global values come from the in-memory copy, not blob storage.
+        
+        Args:
+            tenant_id: Tenant identifier
+        
+        Returns:
+            BrandingConfig with inherited fields filled in
+        """
+        branding = await self.get_tenant_branding(tenant_id)
+        if not branding.inherit_global:
+            return branding
+        
+        global_branding = self._global or self._get_default_branding()
+        inherited = {
+            field: getattr(global_branding, field)
+            for field in self._INHERITED_FIELDS
+            if getattr(branding, field) is None
+        }
+        return branding.model_copy(update=inherited)
     
     async def set_tenant_branding(
         self,
@@ -173,7 +307,7 @@ class BrandingService:
             True if successful
         """
         if self._mock_mode or not self.blob_service_client:
-            logger.info(f"[MOCK] Branding updated for tenant {tenant_id}")
+            logger.info("[MOCK] Branding updated for tenant %s", tenant_id)
             self._cache[tenant_id] = branding
             return True
         
@@ -183,95 +317,102 @@ class BrandingService:
                 blob=f"tenants/{tenant_id}/branding.json"
             )
             
-            data = json.dumps(branding.model_dump(), indent=2)
-            blob_client.upload_blob(
+            data = branding.model_dump_json(indent=2)
+            await asyncio.to_thread(
+                blob_client.upload_blob,
                 data,
                 overwrite=True,
-                content_settings=ContentSettings(content_type="application/json")
+                content_settings=self._CS_JSON
             )
             
             # Update cache
             self._cache[tenant_id] = branding
             
-            logger.info(f"Branding updated for tenant {tenant_id}")
+            logger.info("Branding updated for tenant %s", tenant_id)
             return True
             
         except Exception as e:
-            logger.error(f"Failed to set tenant branding for {tenant_id}: {e}")
+            logger.error("Failed to set tenant branding for %s: %s", tenant_id, e)
             return False
     
     async def upload_logo(
         self,
         tenant_id: str,
-        logo_data: bytes,
-        filename: str
+        logo_data: Union[bytes, IO[bytes]],
+        filename: str,
+        length: Optional[int] = None
     ) -> Optional[str]:
         """
         Upload logo image for a tenant.
         
         Args:
             tenant_id: Tenant identifier
-            logo_data: Logo image bytes
+            logo_data: Logo image bytes or a readable binary stream
             filename: Original filename
+            length: Size of the data in bytes, if known
         
         Returns:
             URL of uploaded logo, or None if failed
         """
         if self._mock_mode or not self.blob_service_client:
             mock_url = f"https://mock.blob.core.windows.net/branding/tenants/{tenant_id}/logo.png"
-            logger.info(f"[MOCK] Logo uploaded: {mock_url}")
+            logger.info("[MOCK] Logo uploaded: %s", mock_url)
             return mock_url
         
         try:
-            # Determine content type
-            content_type = "image/png"
-            if filename.lower().endswith(".jpg") or filename.lower().endswith(".jpeg"):
-                content_type = "image/jpeg"
-            elif filename.lower().endswith(".svg"):
-                content_type = "image/svg+xml"
+            # Determine content settings from the extension (single scan of filename)
+            _, dot, ext = filename.rpartition(".")
+            ext = ext.lower() if dot else "png"
+            content_settings = self._CS_BY_EXT.get(ext, self._CS_OCTET_STREAM)
             
-            blob_name = f"tenants/{tenant_id}/logo{filename[filename.rfind('.'):]}"
+            blob_name = f"tenants/{tenant_id}/logo.{ext}"
             blob_client = self.blob_service_client.get_blob_client(
                 container=self.container_name,
                 blob=blob_name
             )
             
-            blob_client.upload_blob(
+            # Large uploads run in a worker thread so they don't block the event loop
+            await asyncio.to_thread(
+                blob_client.upload_blob,
                 logo_data,
                 overwrite=True,
-                content_settings=ContentSettings(content_type=content_type)
+                length=length,
+                max_concurrency=UPLOAD_MAX_CONCURRENCY,
+                content_settings=content_settings
             )
             
             # Construct URL
             logo_url = f"{self.settings.azure_storage_account_url}/{self.container_name}/{blob_name}"
             
-            logger.info(f"Logo uploaded for tenant {tenant_id}: {logo_url}")
+            logger.info("Logo uploaded for tenant %s: %s", tenant_id, logo_url)
             return logo_url
             
         except Exception as e:
-            logger.error(f"Failed to upload logo for {tenant_id}: {e}")
+            logger.error("Failed to upload logo for %s: %s", tenant_id, e)
             return None
     
     async def upload_brand_guide(
         self,
         tenant_id: str,
-        guide_data: bytes,
-        filename: str
+        guide_data: Union[bytes, IO[bytes]],
+        filename: str,
+        length: Optional[int] = None
     ) -> Optional[str]:
         """
         Upload brand guide document for a tenant.
         
         Args:
             tenant_id: Tenant identifier
-            guide_data: Brand guide document bytes
+            guide_data: Brand guide document bytes or a readable binary stream
             filename: Original filename
+            length: Size of the data in bytes, if known
         
         Returns:
             URL of uploaded document, or None if failed
         """
         if self._mock_mode or not self.blob_service_client:
             mock_url = f"https://mock.blob.core.windows.net/branding/tenants/{tenant_id}/brand-guide.pdf"
-            logger.info(f"[MOCK] Brand guide uploaded: {mock_url}")
+            logger.info("[MOCK] Brand guide uploaded: %s", mock_url)
             return mock_url
         
         try:
@@ -281,19 +422,22 @@ class BrandingService:
                 blob=blob_name
             )
             
-            blob_client.upload_blob(
+            await asyncio.to_thread(
+                blob_client.upload_blob,
                 guide_data,
                 overwrite=True,
-                content_settings=ContentSettings(content_type="application/pdf")
+                length=length,
+                max_concurrency=UPLOAD_MAX_CONCURRENCY,
+                content_settings=self._CS_PDF
             )
             
             guide_url = f"{self.settings.azure_storage_account_url}/{self.container_name}/{blob_name}"
             
-            logger.info(f"Brand guide uploaded for tenant {tenant_id}: {guide_url}")
+            logger.info("Brand guide uploaded for tenant %s: %s", tenant_id, guide_url)
             return guide_url
             
         except Exception as e:
-            logger.error(f"Failed to upload brand guide for {tenant_id}: {e}")
+            logger.error("Failed to upload brand guide for %s: %s", tenant_id, e)
             return None
     
     def _get_default_branding(self) -> GlobalBranding:
@@ -309,12 +453,12 @@ class BrandingService:
     
     def _get_default_tenant_branding(self, tenant_id: str) -> BrandingConfig:
         """Get default tenant branding (inherits from global)."""
-        return BrandingConfig(
-            logo_url=None,
-            primary_color=None,
-            secondary_color=None,
-            accent_color=None,
-            font_family=None,
-            custom_css=None,
-            inherit_global=True
-        )
+        return self._DEFAULT_TENANT_BRANDING
+    
+    async def close(self) -> None:
+        """Stop background refresh tasks."""
+        if self._background_tasks:
+            for task in self._background_tasks:
+                task.cancel()
+            self._background_tasks = []
+            logger.info("Branding service closed")
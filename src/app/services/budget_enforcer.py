@@ -18,6 +18,17 @@ logger = logging.getLogger(__name__)
 class BudgetEnforcer:
     """Enforces budget policies for tenants."""
     
+    # Enforcement policy -> (allowed, reason format) once the threshold is reached.
+    # THROTTLE allows the request; throttling itself is applied by the rate limiter.
+    _POLICY = {
+        BudgetEnforcement.BLOCK: (
+            False,
+            "Budget exceeded: ${current_cost:.2f} / ${budget_limit:.2f} ({usage_percent:.1f}%)"
+        ),
+        BudgetEnforcement.THROTTLE: (True, "Budget warning: {usage_percent:.1f}% used"),
+        BudgetEnforcement.WARN: (True, "Budget warning: {usage_percent:.1f}% used"),
+    }
+    
     def __init__(self, settings: Settings, cost_tracker: CostTracker):
         """Initialize budget enforcer."""
         self.settings = settings
@@ -41,57 +52,89 @@ class BudgetEnforcer:
             return True, None, None
         
         try:
-            # Get current costs for the month
-            costs = await self.cost_tracker.get_tenant_costs(tenant_config.id)
-            
-            budget_limit = Decimal(str(tenant_config.budget_limit))
-            current_cost = costs.total_cost
-            threshold = tenant_config.budget_threshold  # e.g., 90%
-            
-            # Calculate usage percentage
-            usage_percent = (current_cost / budget_limit * 100) if budget_limit > 0 else 0
-            
-            # Check if threshold exceeded
-            if usage_percent < threshold:
+            allowed, over_threshold, usage_percent, current_cost = await self._evaluate(
+                tenant_config
+            )
+            if not over_threshold:
                 # Within budget
                 return True, None, None
             
             # Threshold exceeded - create alert
+            budget_limit = Decimal(str(tenant_config.budget_limit))
             alert = BudgetAlert(
                 tenant_id=tenant_config.id,
                 budget_limit=budget_limit,
                 current_cost=current_cost,
-                threshold=threshold,
+                threshold=tenant_config.budget_threshold,
                 usage_percent=usage_percent,
                 timestamp=datetime.utcnow()
             )
             
-            # Apply enforcement policy
-            enforcement = tenant_config.budget_enforcement
+            # Unknown policies default to warn without a reason
+            _, reason_format = self._POLICY.get(tenant_config.budget_enforcement, (True, None))
+            if reason_format is None:
+                return allowed, None, alert
             
-            if enforcement == BudgetEnforcement.BLOCK:
-                # Block all requests
-                return False, f"Budget exceeded: ${current_cost:.2f} / ${budget_limit:.2f} ({usage_percent:.1f}%)", alert
+            if allowed:
+                logger.warning("Budget threshold reached for %s: %.1f%%", tenant_config.id, usage_percent)
             
-            elif enforcement == BudgetEnforcement.THROTTLE:
-                # Allow with warning, throttle will be applied by rate limiter
-                logger.warning(f"Budget threshold reached for {tenant_config.id}: {usage_percent:.1f}%")
-                return True, f"Budget warning: {usage_percent:.1f}% used", alert
-            
-            elif enforcement == BudgetEnforcement.WARN:
-                # Just warn, don't block
-                logger.warning(f"Budget threshold reached for {tenant_config.id}: {usage_percent:.1f}%")
-                return True, f"Budget warning: {usage_percent:.1f}% used", alert
+            reason = reason_format.format(
+                current_cost=current_cost,
+                budget_limit=budget_limit,
+                usage_percent=usage_percent
+            )
+            return allowed, reason, alert
             
-            else:
-                # Unknown enforcement, default to warn
-                return True, None, alert
-                
         except Exception as e:
-            logger.error(f"Budget check failed for {tenant_config.id}: {e}")
+            logger.error("Budget check failed for %s: %s", tenant_config.id, e)
             # Fail open - allow request if budget check has issues
             return True, None, None
     
+    async def check_budget_bool(self, tenant_config: TenantConfig) -> bool:
+        """
+        Check if tenant is within budget without building an alert or reason.
+        
+        Args:
+            tenant_config: Tenant configuration with budget settings
+        
+        Returns:
+            True if the request is allowed
+        """
+        if not tenant_config.budget_limit:
+            return True
+        
+        try:
+            allowed, _, _, _ = await self._evaluate(tenant_config)
+            return allowed
+        except Exception as e:
+            logger.error("Budget check failed for %s: %s", tenant_config.id, e)
+            # Fail open - allow request if budget check has issues
+            return True
+    
+    async def _evaluate(
+        self,
+        tenant_config: TenantConfig
+    ) -> Tuple[bool, bool, float, Decimal]:
+        """
+        Evaluate budget usage for a tenant with a budget limit set.
+        
+        Returns:
+            Tuple of (allowed, over_threshold, usage_percent, current_cost)
+        """
+        # Get current costs for the month
+        costs = await self.cost_tracker.get_tenant_costs(tenant_config.id)
+        current_cost = costs.total_cost
+        
+        # Calculate usage percentage in float; only the comparison needs it
+        limit_f = float(tenant_config.budget_limit)
+        usage_percent = (float(current_cost) / limit_f * 100.0) if limit_f > 0 else 0.0
+        
+        if usage_percent < tenant_config.budget_threshold:
+            return True, False, usage_percent, current_cost
+        
+        allowed, _ = self._POLICY.get(tenant_config.budget_enforcement, (True, None))
+        return allowed, True, usage_percent, current_cost
+    
     async def get_budget_status(self, tenant_config: TenantConfig) -> dict:
         """
         Get detailed budget status for a tenant.
@@ -111,15 +154,18 @@ class BudgetEnforcer:
         
         try:
             costs = await self.cost_tracker.get_tenant_costs(tenant_config.id)
-            budget_limit = Decimal(str(tenant_config.budget_limit))
-            current_cost = costs.total_cost
+            # Everything below is reported as float, so compute in float
+            budget_limit = float(tenant_config.budget_limit)
+            current_cost = float(costs.total_cost)
             remaining = budget_limit - current_cost
-            usage_percent = (current_cost / budget_limit * 100) if budget_limit > 0 else 0
+            usage_percent = (current_cost / budget_limit * 100.0) if budget_limit > 0 else 0.0
             
             # Get forecast
-            forecast = await self.cost_tracker.get_cost_forecast(tenant_config.id, days_ahead=30)
+            forecast = float(
+                await self.cost_tracker.get_cost_forecast(tenant_config.id, days_ahead=30)
+            )
             projected_total = current_cost + forecast
-            projected_percent = (projected_total / budget_limit * 100) if budget_limit > 0 else 0
+            projected_percent = (projected_total / budget_limit * 100.0) if budget_limit > 0 else 0.0
             
             status = "OK"
             if usage_percent >= tenant_config.budget_threshold:
@@ -130,23 +176,23 @@ class BudgetEnforcer:
             return {
                 "tenant_id": tenant_config.id,
                 "budget_enabled": True,
-                "budget_limit": float(budget_limit),
-                "current_cost": float(current_cost),
-                "remaining": float(remaining),
-                "usage_percent": float(usage_percent),
+                "budget_limit": budget_limit,
+                "current_cost": current_cost,
+                "remaining": remaining,
+                "usage_percent": usage_percent,
                 "threshold": tenant_config.budget_threshold,
                 "enforcement": tenant_config.budget_enforcement.value,
                 "status": status,
-                "forecast_30_days": float(forecast),
-                "projected_total": float(projected_total),
-                "projected_percent": float(projected_percent),
-                "period_start": costs.period_start.isoformat(),
-                "period_end": costs.period_end.isoformat(),
+                "forecast_30_days": forecast,
+                "projected_total": projected_total,
+                "projected_percent": projected_percent,
+                "period_start": costs.period_start_iso,
+                "period_end": costs.period_end_iso,
                 "currency": costs.currency
             }
             
         except Exception as e:
-            logger.error(f"Failed to get budget status for {tenant_config.id}: {e}")
+            logger.error("Failed to get budget status for %s: %s", tenant_config.id, e)
             return {
                 "tenant_id": tenant_config.id,
                 "budget_enabled": True,
@@ -183,7 +229,10 @@ class BudgetEnforcer:
             period_end=datetime.utcnow()
         )
         
-        logger.info(f"Budget updated for {tenant_id}: ${budget_limit}, threshold={threshold}%, enforcement={enforcement}")
+        logger.info(
+            "Budget updated for %s: $%s, threshold=%s%%, enforcement=%s",
+            tenant_id, budget_limit, threshold, enforcement
+        )
         return budget
     
     def should_throttle(self, usage_percent: float, threshold: float) -> bool:
@@ -2,12 +2,15 @@
 Cost tracking service with Azure Cost Management API integration.
 Tracks resource usage and costs per tenant.
 """
+import asyncio
+import copy
 import logging
-from typing import Optional, Dict, List
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Optional, Dict, List, Tuple
 from datetime import datetime, timedelta
-from decimal import Decimal
+from decimal import ROUND_HALF_UP, Context, Decimal, localcontext
 
-from azure.identity import DefaultAzureCredential
 from azure.mgmt.costmanagement import CostManagementClient
 from azure.mgmt.costmanagement.models import (
     QueryDefinition,
@@ -20,10 +23,39 @@ from azure.mgmt.costmanagement.models import (
 
 from ..config import Settings
 from ..models.cost import TenantCost, CostBreakdown
+from .azure_auth import get_credential
+from .single_flight import single_flight
 
 logger = logging.getLogger(__name__)
 
 
+# Number of mock cost shards (power of two so the shard index is a mask)
+_MOCK_COST_SHARDS = 16
+
+
+# Cost arithmetic context: USD amounts need far fewer than the default 28 digits
+_COST_CTX = Context(prec=12, rounding=ROUND_HALF_UP)
+
+
+# Upper bound on cached cost / forecast results (least recently used evicted first)
+COST_CACHE_MAXSIZE = 1024
+
+
+def _fnv1a(data: bytes) -> int:
+    """64-bit FNV-1a hash; stable across processes unlike the built-in hash()."""
+    h = 0xcbf29ce484222325
+    for byte in data:
+        h = ((h ^ byte) * 0x100000001b3) & 0xFFFFFFFFFFFFFFFF
+    return h
+
+
+def _to_decimal(value: Any) -> Decimal:
+    """Convert a cost cell to Decimal, skipping the str() round-trip unless it is a float."""
+    if isinstance(value, float):
+        return Decimal(repr(value))
+    return Decimal(value)
+
+
 class CostTracker:
     """Tracks and reports Azure resource costs per tenant."""
     
@@ -31,7 +63,20 @@ class CostTracker:
         """Initialize cost tracker."""
         self.settings = settings
         self.cost_client: Optional[CostManagementClient] = None
-        self._mock_costs: Dict[str, Decimal] = {}
+        # Mock running totals, striped by tenant hash so concurrent writers rarely share a dict
+        self._mock_cost_shards: List[Dict[str, float]] = [{} for _ in range(_MOCK_COST_SHARDS)]
+        
+        # Short-lived caches for Cost Management queries: key -> (monotonic time, result)
+        self._cache_ttl = settings.cost_cache_ttl_seconds or 180
+        self._cost_cache: "OrderedDict[Tuple[str, ...], Tuple[float, TenantCost]]" = OrderedDict()
+        self._forecast_cache: "OrderedDict[Tuple[str, int], Tuple[float, Decimal]]" = OrderedDict()
+        
+        # In-flight queries shared by concurrent callers with the same cache key
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        
+        # Query dataset templates, built once in initialize() and copied per query
+        self._usage_dataset_template: Optional[QueryDataset] = None
+        self._forecast_dataset_template: Optional[QueryDataset] = None
     
     async def initialize(self) -> None:
         """Initialize Azure Cost Management client."""
@@ -40,7 +85,24 @@ class CostTracker:
             return
         
         try:
-            credential = DefaultAzureCredential()
+            self._usage_dataset_template = QueryDataset(
+                granularity="Daily",
+                aggregation={
+                    "totalCost": QueryAggregation(name="PreTaxCost", function="Sum")
+                },
+                grouping=[
+                    QueryGrouping(type="Dimension", name="ServiceName"),
+                    QueryGrouping(type="Tag", name="TenantId")
+                ]
+            )
+            self._forecast_dataset_template = QueryDataset(
+                granularity="Daily",
+                aggregation={
+                    "totalCost": QueryAggregation(name="PreTaxCost", function="Sum")
+                }
+            )
+            
+            credential = get_credential()
             self.cost_client = CostManagementClient(credential)
             logger.info("Cost tracker initialized with Azure Cost Management API")
         except Exception as e:
@@ -51,7 +113,8 @@ class CostTracker:
         self,
         tenant_id: str,
         start_date: Optional[datetime] = None,
-        end_date: Optional[datetime] = None
+        end_date: Optional[datetime] = None,
+        summary_only: bool = False
     ) -> TenantCost:
         """
         Get cost summary for a tenant.
@@ -60,13 +123,101 @@ class CostTracker:
             tenant_id: Tenant identifier
             start_date: Start date for cost query (default: beginning of month)
             end_date: End date for cost query (default: today)
+            summary_only: Only compute total_cost and skip building breakdowns
         
         Returns:
-            TenantCost object with cost breakdown
+            TenantCost object with cost breakdown (empty when summary_only)
         """
         if self.cost_client is None:
             return self._get_mock_costs(tenant_id, start_date, end_date)
         
+        # Omitted dates mean "current month to now", keyed by placeholders
+        cache_key: Tuple[str, ...] = (
+            tenant_id,
+            start_date.isoformat() if start_date else "m",
+            end_date.isoformat() if end_date else "t"
+        )
+        cached = self._cache_get(self._cost_cache, cache_key)
+        if cached is not None:
+            # A full result also answers a summary-only request
+            return cached
+        
+        if summary_only:
+            cache_key = (*cache_key, "summary")
+            cached = self._cache_get(self._cost_cache, cache_key)
+            if cached is not None:
+                return cached
+        
+        return await single_flight(
+            self._inflight,
+            cache_key,
+            lambda: self._query_tenant_costs(
+                tenant_id, start_date, end_date, cache_key, summary_only
+            )
+        )
+    
+    @staticmethod
+    def _tenant_dataset(
+        template: QueryDataset,
+        tenant_ids: Optional[List[str]]
+    ) -> QueryDataset:
+        """Copy a dataset template, filtered to the given tenants (unfiltered if None)."""
+        dataset = copy.copy(template)
+        if tenant_ids:
+            dataset.filter = {
+                "tags": {
+                    "name": "TenantId",
+                    "operator": "In",
+                    "values": tenant_ids
+                }
+            }
+        return dataset
+    
+    def _cache_get(self, cache: OrderedDict, key: Tuple) -> Any:
+        """
+        Look up a cached result, evicting the entry if it has expired.
+        
+        Returns:
+            Cached result, or None on a miss
+        """
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        
+        if time.monotonic() - entry[0] >= self._cache_ttl:
+            del cache[key]
+            return None
+        
+        cache.move_to_end(key)
+        return entry[1]
+    
+    def _cache_put(
+        self,
+        cache: OrderedDict,
+        key: Tuple,
+        value: Any,
+        now: Optional[float] = None
+    ) -> None:
+        """Cache a result, dropping expired entries and then the least recently used when full."""
+        if now is None:
+            now = time.monotonic()
+        cache[key] = (now, value)
+        cache.move_to_end(key)
+        if len(cache) > COST_CACHE_MAXSIZE:
+            for stale in [k for k, (inserted, _) in cache.items() if now - inserted >= self._cache_ttl]:
+                del cache[stale]
+            while len(cache) > COST_CACHE_MAXSIZE:
+                cache.popitem(last=False)
+    
+    async def _query_tenant_costs(
+        self,
+        tenant_id: str,
+        start_date: Optional[datetime],
+        end_date: Optional[datetime],
+        cache_key: Tuple[str, ...],
+        summary_only: bool = False
+    ) -> TenantCost:
+        """Query Azure Cost Management for a tenant and cache the result."""
         try:
             # Default to current month
             if not start_date:
@@ -84,46 +235,28 @@ class CostTracker:
                     from_property=start_date.isoformat(),
                     to=end_date.isoformat()
                 ),
-                dataset=QueryDataset(
-                    granularity="Daily",
-                    aggregation={
-                        "totalCost": QueryAggregation(name="PreTaxCost", function="Sum")
-                    },
-                    grouping=[
-                        QueryGrouping(type="Dimension", name="ServiceName"),
-                        QueryGrouping(type="Tag", name="TenantId")
-                    ],
-                    filter={
-                        "tags": {
-                            "name": "TenantId",
-                            "operator": "In",
-                            "values": [tenant_id]
-                        }
-                    }
-                )
+                dataset=self._tenant_dataset(self._usage_dataset_template, [tenant_id])
             )
             
-            result = self.cost_client.query.usage(scope, query)
+            result = await asyncio.to_thread(self.cost_client.query.usage, scope, query)
             
-            # Parse results
-            total_cost = Decimal("0.0")
-            breakdowns: List[CostBreakdown] = []
-            
-            if result.rows:
-                for row in result.rows:
-                    # row format: [cost, service_name, tenant_id, date]
-                    cost = Decimal(str(row[0]))
-                    service = row[1]
-                    date = row[3]
-                    
-                    total_cost += cost
-                    breakdowns.append(CostBreakdown(
-                        service=service,
-                        cost=cost,
-                        date=datetime.fromisoformat(date)
-                    ))
+            # Parse results; row format: [cost, service_name, tenant_id, date]
+            rows = result.rows or []
+            if summary_only:
+                with localcontext(_COST_CTX):
+                    total_cost = sum((_to_decimal(row[0]) for row in rows), Decimal("0.0"))
+                breakdowns: List[CostBreakdown] = []
+            else:
+                costs = [_to_decimal(row[0]) for row in rows]
+                with localcontext(_COST_CTX):
+                    total_cost = sum(costs, Decimal("0.0"))
+                # Pydantic parses the ISO date strings itself; no per-row fromisoformat()
+                breakdowns = [
+                    CostBreakdown(service=row[1], cost=cost, date=row[3])
+                    for row, cost in zip(rows, costs)
+                ]
             
-            return TenantCost(
+            tenant_cost = TenantCost(
                 tenant_id=tenant_id,
                 total_cost=total_cost,
                 period_start=start_date,
@@ -131,11 +264,17 @@ class CostTracker:
                 currency="USD",
                 breakdowns=breakdowns
             )
+            self._cache_put(self._cost_cache, cache_key, tenant_cost)
+            return tenant_cost
             
         except Exception as e:
             logger.error(f"Failed to get costs for tenant {tenant_id}: {e}")
             return self._get_mock_costs(tenant_id, start_date, end_date)
     
+    def _mock_shard(self, tenant_id: str) -> Dict[str, float]:
+        """Get the mock cost shard holding a tenant's running total."""
+        return self._mock_cost_shards[hash(tenant_id) & (_MOCK_COST_SHARDS - 1)]
+    
     def _get_mock_costs(
         self,
         tenant_id: str,
@@ -148,41 +287,41 @@ class CostTracker:
         if not end_date:
             end_date = datetime.utcnow()
         
-        # Generate predictable mock costs based on tenant ID hash
-        base_cost = Decimal(str(hash(tenant_id) % 1000))
-        
-        if tenant_id not in self._mock_costs:
-            self._mock_costs[tenant_id] = base_cost
+        # Generate predictable mock costs based on a stable tenant ID hash.
+        # Computed in float; Decimal is only created for the returned model.
+        base_cost = _fnv1a(tenant_id.encode()) % 1000
         
         # Increment mock costs slightly each time
-        self._mock_costs[tenant_id] += Decimal("10.50")
+        shard = self._mock_shard(tenant_id)
+        total = shard.get(tenant_id, base_cost) + 10.50
+        shard[tenant_id] = total
         
         breakdowns = [
             CostBreakdown(
                 service="Azure Container Apps",
-                cost=self._mock_costs[tenant_id] * Decimal("0.4"),
+                cost=Decimal(f"{total * 0.4:.2f}"),
                 date=start_date
             ),
             CostBreakdown(
                 service="Azure Key Vault",
-                cost=self._mock_costs[tenant_id] * Decimal("0.1"),
+                cost=Decimal(f"{total * 0.1:.2f}"),
                 date=start_date
             ),
             CostBreakdown(
                 service="Azure Cache for Redis",
-                cost=self._mock_costs[tenant_id] * Decimal("0.3"),
+                cost=Decimal(f"{total * 0.3:.2f}"),
                 date=start_date
             ),
             CostBreakdown(
                 service="Azure Blob Storage",
-                cost=self._mock_costs[tenant_id] * Decimal("0.2"),
+                cost=Decimal(f"{total * 0.2:.2f}"),
                 date=start_date
             )
         ]
         
         return TenantCost(
             tenant_id=tenant_id,
-            total_cost=self._mock_costs[tenant_id],
+            total_cost=Decimal(f"{total:.2f}"),
             period_start=start_date,
             period_end=end_date,
             currency="USD",
@@ -224,11 +363,28 @@ class CostTracker:
         """
         if self.cost_client is None:
             # Mock forecast: current daily cost * days
-            current_costs = await self.get_tenant_costs(tenant_id)
-            days_in_period = (current_costs.period_end - current_costs.period_start).days or 1
-            daily_cost = current_costs.total_cost / Decimal(str(days_in_period))
-            return daily_cost * Decimal(str(days_ahead))
+            daily_cost = await self._daily_from_history(tenant_id)
+            with localcontext(_COST_CTX):
+                return daily_cost * days_ahead
+        
+        cache_key = (tenant_id, days_ahead)
+        cached = self._cache_get(self._forecast_cache, cache_key)
+        if cached is not None:
+            return cached
         
+        return await single_flight(
+            self._inflight,
+            cache_key,
+            lambda: self._query_cost_forecast(tenant_id, days_ahead, cache_key)
+        )
+    
+    async def _query_cost_forecast(
+        self,
+        tenant_id: str,
+        days_ahead: int,
+        cache_key: Tuple[str, int]
+    ) -> Decimal:
+        """Query Azure Cost Management for a tenant forecast and cache the result."""
         try:
             # Query actual forecast from Azure
             scope = f"/subscriptions/{self.settings.azure_subscription_id}"
@@ -241,46 +397,109 @@ class CostTracker:
                     from_property=datetime.utcnow().isoformat(),
                     to=end_date.isoformat()
                 ),
-                dataset=QueryDataset(
-                    granularity="Daily",
-                    aggregation={
-                        "totalCost": QueryAggregation(name="PreTaxCost", function="Sum")
-                    },
-                    filter={
-                        "tags": {
-                            "name": "TenantId",
-                            "operator": "In",
-                            "values": [tenant_id]
-                        }
-                    }
-                )
+                dataset=self._tenant_dataset(self._forecast_dataset_template, [tenant_id])
             )
             
-            result = self.cost_client.query.usage(scope, query)
+            result = await asyncio.to_thread(self.cost_client.query.usage, scope, query)
             
-            total_forecast = Decimal("0.0")
-            if result.rows:
-                for row in result.rows:
-                    total_forecast += Decimal(str(row[0]))
+            with localcontext(_COST_CTX):
+                total_forecast = sum(
+                    (_to_decimal(row[0]) for row in result.rows or []), Decimal("0.0")
+                )
             
+            self._cache_put(self._forecast_cache, cache_key, total_forecast)
             return total_forecast
             
         except Exception as e:
             logger.error(f"Failed to get cost forecast for {tenant_id}: {e}")
             # Fallback to simple calculation
-            current_costs = await self.get_tenant_costs(tenant_id)
-            days_in_period = (current_costs.period_end - current_costs.period_start).days or 1
-            daily_cost = current_costs.total_cost / Decimal(str(days_in_period))
-            return daily_cost * Decimal(str(days_ahead))
+            daily_cost = await self._daily_from_history(tenant_id)
+            with localcontext(_COST_CTX):
+                return daily_cost * days_ahead
+    
+    async def _daily_from_history(self, tenant_id: str) -> Decimal:
+        """
+        Average daily cost for the current month so far.
+        Reuses cached month costs when fresh; otherwise fetches a summary only.
+        """
+        current_costs = await self.get_tenant_costs(tenant_id, summary_only=True)
+        days_in_period = (current_costs.period_end - current_costs.period_start).days or 1
+        with localcontext(_COST_CTX):
+            return current_costs.total_cost / days_in_period
     
-    async def get_all_tenant_costs(self) -> List[TenantCost]:
+    async def get_all_tenant_costs(
+        self,
+        tenant_ids: Optional[List[str]] = None
+    ) -> List[TenantCost]:
         """
-        Get costs for all tenants.
+        Get current month costs for all tenants in a single query.
+        
+        Args:
+            tenant_ids: Optional subset of tenants to include (default: all tagged tenants)
         
         Returns:
-            List of TenantCost objects
+            List of TenantCost objects, one per tenant with costs
         """
-        # This would query all unique tenant IDs from tags
-        # For now, return empty list as this requires tenant registry
-        logger.warning("get_all_tenant_costs not fully implemented")
-        return []
+        if self.cost_client is None:
+            return [self._get_mock_costs(tenant_id) for tenant_id in tenant_ids or []]
+        
+        start_date = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        end_date = datetime.utcnow()
+        
+        try:
+            scope = f"/subscriptions/{self.settings.azure_subscription_id}"
+            
+            # Group by the TenantId tag; only filter when a subset is requested
+            dataset = self._tenant_dataset(self._usage_dataset_template, tenant_ids)
+            
+            query = QueryDefinition(
+                type="ActualCost",
+                timeframe=TimeframeType.CUSTOM,
+                time_period=QueryTimePeriod(
+                    from_property=start_date.isoformat(),
+                    to=end_date.isoformat()
+                ),
+                dataset=dataset
+            )
+            
+            result = await asyncio.to_thread(self.cost_client.query.usage, scope, query)
+            
+            # Bucket rows by tenant in a single pass
+            totals: Dict[str, Decimal] = defaultdict(Decimal)
+            buckets: Dict[str, List[CostBreakdown]] = defaultdict(list)
+            
+            with localcontext(_COST_CTX):
+                for row in result.rows or []:
+                    # row format: [cost, service_name, tenant_id, date]
+                    tenant_id = row[2]
+                    if not tenant_id:
+                        continue
+                    
+                    cost = _to_decimal(row[0])
+                    totals[tenant_id] += cost
+                    buckets[tenant_id].append(CostBreakdown(
+                        service=row[1],
+                        cost=cost,
+                        date=row[3]
+                    ))
+            
+            now = time.monotonic()
+            tenant_costs = []
+            for tenant_id, breakdowns in buckets.items():
+                tenant_cost = TenantCost(
+                    tenant_id=tenant_id,
+                    total_cost=totals[tenant_id],
+                    period_start=start_date,
+                    period_end=end_date,
+                    currency="USD",
+                    breakdowns=breakdowns
+                )
+                # Same period as a default get_tenant_costs call, so share the cache
+                self._cache_put(self._cost_cache, (tenant_id, "m", "t"), tenant_cost, now)
+                tenant_costs.append(tenant_cost)
+            
+            return tenant_costs
+            
+        except Exception as e:
+            logger.error(f"Failed to get costs for all tenants: {e}")
+            return []
@@ -2,24 +2,76 @@
 FoundryIQ client for multi-agent orchestration.
 Integrates with Microsoft Foundry to route queries to specialized agents.
 """
+import asyncio
 import logging
+import re
+import time
 from typing import Optional, List, Dict, Any
 import httpx
-from datetime import datetime
+import orjson
+from datetime import datetime, timezone
 
 from ..config import Settings
 
 logger = logging.getLogger(__name__)
 
 
+# Above these sizes JSON encoding/decoding runs in a worker thread to keep the loop free
+LARGE_CONTEXT_CHARS = 4096
+LARGE_RESPONSE_BYTES = 65536
+
+
+def _estimate_context_size(context: Optional[Dict[str, Any]]) -> int:
+    """
+    Estimate a context's serialized JSON size, walking nested lists and dicts.
+    
+    Counting stops once LARGE_CONTEXT_CHARS is reached, so huge contexts cost
+    no more to estimate than the threshold itself.
+    """
+    size = 0
+    stack: List[Any] = [context] if context else []
+    while stack and size < LARGE_CONTEXT_CHARS:
+        value = stack.pop()
+        if isinstance(value, (str, bytes)):
+            size += len(value) + 3
+        elif isinstance(value, dict):
+            size += 2 + sum(len(key) + 4 for key in value)
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            size += 2 + len(value)
+            stack.extend(value)
+        else:
+            # Numbers, booleans and null; floats like embeddings run ~20 chars
+            size += 20 if isinstance(value, float) else 8
+    return size
+
+
 class FoundryIQClient:
     """Client for Microsoft FoundryIQ multi-agent orchestration."""
     
+    # Mock-mode keyword routing, checked in priority order (substring match)
+    _MOCK_ROUTES = (
+        ("foundry-sales-001", re.compile(r"sale|revenue|customer|order", re.IGNORECASE)),
+        ("foundry-inventory-001", re.compile(r"inventory|stock|warehouse", re.IGNORECASE)),
+    )
+    
+    _MOCK_AGENT_NAMES = {
+        "foundry-sales-001": "Sales Agent",
+        "foundry-inventory-001": "Inventory Agent",
+        "foundry-general-001": "General Knowledge Agent"
+    }
+    
     def __init__(self, settings: Settings):
         """Initialize FoundryIQ client."""
         self.settings = settings
         self.http_client: Optional[httpx.AsyncClient] = None
         self._mock_mode = settings.local_mock_services
+        
+        # Static part of each agent's mock response; copied and filled in per call
+        self._mock_templates: Dict[str, Dict[str, Any]] = {
+            agent_id: self._build_mock_template(agent_id)
+            for agent_id in self._MOCK_AGENT_NAMES
+        }
     
     async def initialize(self) -> None:
         """Initialize HTTP client."""
@@ -27,8 +79,20 @@ class FoundryIQClient:
             logger.warning("FoundryIQ client running in mock mode")
             return
         
+        # One pooled HTTP/2 connection multiplexes concurrent agent queries.
+        # http2/limits must be set on the transport when a transport is supplied.
+        transport = httpx.AsyncHTTPTransport(
+            http2=True,
+            retries=1,
+            limits=httpx.Limits(
+                max_connections=100,
+                max_keepalive_connections=50,
+                keepalive_expiry=30.0
+            )
+        )
         self.http_client = httpx.AsyncClient(
-            timeout=httpx.Timeout(60.0),
+            timeout=httpx.Timeout(60.0, connect=5.0),
+            transport=transport,
             headers={
                 "Content-Type": "application/json",
                 "User-Agent": f"{self.settings.app_name}/{self.settings.app_version}"
@@ -67,17 +131,30 @@ class FoundryIQClient:
                 "message": message,
                 "conversation_id": conversation_id,
                 "context": context or {},
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": datetime.now(timezone.utc).isoformat()
             }
             
+            if _estimate_context_size(context) < LARGE_CONTEXT_CHARS:
+                body = orjson.dumps(request_payload)
+            else:
+                body = await asyncio.to_thread(orjson.dumps, request_payload)
+            
             # Send request to FoundryIQ
+            # Client default headers already set Content-Type: application/json
             response = await self.http_client.post(
                 f"{endpoint}/v1/agents/query",
-                json=request_payload
+                content=body
             )
-            response.raise_for_status()
+            if response.status_code >= 400:
+                logger.warning(
+                    f"FoundryIQ query failed - Agent: {agent_id}, HTTP {response.status_code}"
+                )
+                return self._get_error_response(agent_id, f"HTTP {response.status_code}")
             
-            data = response.json()
+            if len(response.content) > LARGE_RESPONSE_BYTES:
+                data = await asyncio.to_thread(orjson.loads, response.content)
+            else:
+                data = orjson.loads(response.content)
             
             logger.info(f"FoundryIQ query successful - Agent: {agent_id}, ConvID: {conversation_id}")
             
@@ -93,11 +170,11 @@ class FoundryIQClient:
                 "metadata": data.get("metadata", {})
             }
             
-        except httpx.HTTPError as e:
-            logger.error(f"FoundryIQ request failed: {e}")
+        except httpx.TimeoutException as e:
+            logger.error(f"FoundryIQ request timed out: {e}")
             return self._get_error_response(agent_id, str(e))
-        except Exception as e:
-            logger.error(f"Unexpected error in FoundryIQ query: {e}")
+        except httpx.TransportError as e:
+            logger.error(f"FoundryIQ request failed: {e}")
             return self._get_error_response(agent_id, str(e))
     
     async def discover_agents(self, endpoint: str) -> List[Dict[str, Any]]:
@@ -117,7 +194,7 @@ class FoundryIQClient:
             response = await self.http_client.get(f"{endpoint}/v1/agents")
             response.raise_for_status()
             
-            data = response.json()
+            data = orjson.loads(response.content)
             agents = data.get("agents", [])
             
             logger.info(f"Discovered {len(agents)} agents from FoundryIQ")
@@ -127,6 +204,27 @@ class FoundryIQClient:
             logger.error(f"Failed to discover agents: {e}")
             return []
     
+    async def discover_agents_with_capabilities(self, endpoint: str) -> List[Dict[str, Any]]:
+        """
+        Discover agents and fetch their capabilities concurrently.
+        
+        Args:
+            endpoint: FoundryIQ endpoint URL
+        
+        Returns:
+            List of agent definitions merged with their capabilities
+        """
+        agents = await self.discover_agents(endpoint)
+        capabilities = await asyncio.gather(
+            *(self.get_agent_capabilities(endpoint, agent.get("id")) for agent in agents),
+            return_exceptions=True
+        )
+        
+        return [
+            {**agent, **caps} if isinstance(caps, dict) else agent
+            for agent, caps in zip(agents, capabilities)
+        ]
+    
     async def get_agent_capabilities(
         self,
         endpoint: str,
@@ -157,7 +255,7 @@ class FoundryIQClient:
             )
             response.raise_for_status()
             
-            return response.json()
+            return orjson.loads(response.content)
             
         except Exception as e:
             logger.error(f"Failed to get agent capabilities: {e}")
@@ -184,13 +282,10 @@ class FoundryIQClient:
         """
         if self._mock_mode or not self.http_client:
             # Simple keyword-based routing for mock mode
-            message_lower = message.lower()
-            if any(word in message_lower for word in ["sale", "revenue", "customer", "order"]):
-                return "foundry-sales-001"
-            elif any(word in message_lower for word in ["inventory", "stock", "warehouse"]):
-                return "foundry-inventory-001"
-            else:
-                return "foundry-general-001"
+            for agent_id, pattern in self._MOCK_ROUTES:
+                if pattern.search(message):
+                    return agent_id
+            return "foundry-general-001"
         
         try:
             request_payload = {
@@ -201,11 +296,11 @@ class FoundryIQClient:
             
             response = await self.http_client.post(
                 f"{endpoint}/v1/routing/select",
-                json=request_payload
+                content=orjson.dumps(request_payload)
             )
             response.raise_for_status()
             
-            data = response.json()
+            data = orjson.loads(response.content)
             selected_agent = data.get("selected_agent", available_agents[0] if available_agents else None)
             
             logger.info(f"FoundryIQ routed query to agent: {selected_agent}")
@@ -216,6 +311,17 @@ class FoundryIQClient:
             # Fallback to first available agent
             return available_agents[0] if available_agents else "foundry-general-001"
     
+    @staticmethod
+    def _build_mock_template(agent_id: str) -> Dict[str, Any]:
+        """Build the fixed fields of a mock response for an agent."""
+        return {
+            "agent_id": agent_id,
+            "sources_used": [f"mock-source-{agent_id}"],
+            "latency_ms": 0,
+            "model": "gpt-4-turbo",
+            "confidence": 0.95
+        }
+    
     def _get_mock_response(
         self,
         agent_id: str,
@@ -223,28 +329,24 @@ class FoundryIQClient:
         conversation_id: Optional[str]
     ) -> Dict[str, Any]:
         """Generate mock response for testing."""
-        agent_name_map = {
-            "foundry-sales-001": "Sales Agent",
-            "foundry-inventory-001": "Inventory Agent",
-            "foundry-general-001": "General Knowledge Agent"
-        }
+        agent_name = self._MOCK_AGENT_NAMES.get(agent_id, "Unknown Agent")
+        template = self._mock_templates.get(agent_id)
+        if template:
+            response = template.copy()
+            # The copy is shallow; give each response its own sources list
+            response["sources_used"] = list(template["sources_used"])
+        else:
+            response = self._build_mock_template(agent_id)
         
-        agent_name = agent_name_map.get(agent_id, "Unknown Agent")
-        
-        return {
-            "message": f"[Mock FoundryIQ Response from {agent_name}] I understand you're asking: '{message}'. In production, this will connect to FoundryIQ and retrieve data from Microsoft Fabric DataAgents.",
-            "agent_id": agent_id,
-            "conversation_id": conversation_id or f"conv-{datetime.utcnow().timestamp()}",
-            "sources_used": [f"mock-source-{agent_id}"],
-            "tokens_used": len(message.split()) * 2,
-            "latency_ms": 0,
-            "model": "gpt-4-turbo",
-            "confidence": 0.95,
-            "metadata": {
-                "mock": True,
-                "timestamp": datetime.utcnow().isoformat()
-            }
+        response["message"] = f"[Mock FoundryIQ Response from {agent_name}] I understand you're asking: '{message}'. In production, this will connect to FoundryIQ and retrieve data from Microsoft Fabric DataAgents."
+        response["conversation_id"] = conversation_id or f"conv-{time.time()}"
+        # Rough estimate: ~2 tokens per space-separated word, without splitting
+        response["tokens_used"] = (message.count(" ") + 1) * 2 if message else 0
+        response["metadata"] = {
+            "mock": True,
+            "timestamp": datetime.now(timezone.utc).isoformat()
         }
+        return response
     
     def _get_mock_agents(self) -> List[Dict[str, Any]]:
         """Get mock agent list for testing."""
@@ -2,20 +2,90 @@
 Notification service for sending alerts via email and SMS.
 Uses Azure Communication Services.
 """
+import asyncio
 import logging
-from typing import List, Optional
+import uuid
+from collections import defaultdict
+from string import Template
+from typing import Any, Dict, Final, List, Optional, Tuple
 from datetime import datetime
 
-from azure.identity import DefaultAzureCredential
 from azure.communication.email import EmailClient
 from azure.communication.sms import SmsClient
 
 from ..config import Settings
-from ..models.notification import Notification, NotificationChannel, NotificationPriority
+from ..models.notification import (
+    Notification,
+    NotificationChannel,
+    NotificationPriority,
+    NotificationType
+)
+from .azure_auth import get_credential
 
 logger = logging.getLogger(__name__)
 
 
+# Batching limits for bulk sends (ACS caps recipients per email/SMS request)
+EMAIL_BATCH_SIZE = 50
+SMS_BATCH_SIZE = 100
+ALERT_BATCH_INTERVAL_SECONDS = 0.5
+ALERT_SHUTDOWN_TIMEOUT_SECONDS = 10
+
+
+# SMS character limit
+SMS_MAX_LENGTH = 160
+
+
+def _sms_text(message: str) -> str:
+    """Truncate a message to the SMS limit, without copying short messages."""
+    return message if len(message) <= SMS_MAX_LENGTH else message[:SMS_MAX_LENGTH]
+
+
+# Channel sets used by the alert helpers; each notification gets its own list copy
+_EMAIL_AND_IN_APP = (NotificationChannel.EMAIL, NotificationChannel.IN_APP)
+_IN_APP_ONLY = (NotificationChannel.IN_APP,)
+
+# Header/badge colour per notification priority
+_PRIORITY_COLORS: Final[Dict[NotificationPriority, str]] = {
+    NotificationPriority.LOW: "#6c757d",
+    NotificationPriority.MEDIUM: "#0d6efd",
+    NotificationPriority.HIGH: "#ffc107",
+    NotificationPriority.CRITICAL: "#dc3545"
+}
+
+# HTML email body; parsed once at import, filled per notification
+_HTML_EMAIL_TEMPLATE = Template("""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <style>
+                body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+                .header { background-color: $color; color: white; padding: 20px; text-align: center; }
+                .content { padding: 20px; }
+                .footer { background-color: #f8f9fa; padding: 10px; text-align: center; font-size: 12px; color: #6c757d; }
+                .priority { display: inline-block; padding: 5px 10px; border-radius: 3px; font-weight: bold; }
+            </style>
+        </head>
+        <body>
+            <div class="header">
+                <h1>$title</h1>
+            </div>
+            <div class="content">
+                <p><span class="priority" style="background-color: $color; color: white;">
+                    $priority
+                </span></p>
+                <p>$message</p>
+                $metadata_block
+            </div>
+            <div class="footer">
+                <p>Enterprise MCP - Automated Notification</p>
+                <p>Sent at $timestamp</p>
+            </div>
+        </body>
+        </html>
+        """)
+
+
 class NotificationService:
     """Service for sending notifications via email and SMS."""
     
@@ -25,6 +95,22 @@ class NotificationService:
         self.email_client: Optional[EmailClient] = None
         self.sms_client: Optional[SmsClient] = None
         self._mock_mode = settings.local_mock_services
+        self._sender_email = settings.notification_sender_email or "noreply@enterprisemcp.com"
+        self._sender_phone = settings.notification_sender_phone or "+1234567890"
+        
+        # Fixed part of every outgoing email; per-send fields are filled in on a copy
+        self._email_skeleton = {"senderAddress": self._sender_email}
+        
+        self._channel_senders = {
+            NotificationChannel.EMAIL: self._send_email,
+            NotificationChannel.SMS: self._send_sms,
+            NotificationChannel.IN_APP: self._send_in_app
+        }
+        
+        # Budget alerts are queued and sent in batches by a background task
+        self._alert_queue: "asyncio.Queue[Notification]" = asyncio.Queue()
+        self._alert_task: Optional[asyncio.Task] = None
+        self._alert_stop = asyncio.Event()
     
     async def initialize(self) -> None:
         """Initialize Azure Communication Services clients."""
@@ -34,7 +120,7 @@ class NotificationService:
         
         try:
             if self.settings.azure_communication_service_endpoint:
-                credential = DefaultAzureCredential()
+                credential = get_credential()
                 
                 # Initialize email client
                 self.email_client = EmailClient(
@@ -43,17 +129,19 @@ class NotificationService:
                 )
                 
                 # Initialize SMS client (if connection string available)
-                if hasattr(self.settings, 'azure_communication_connection_string'):
+                if self.settings.communication_services_connection_string:
                     self.sms_client = SmsClient.from_connection_string(
-                        self.settings.azure_communication_connection_string
+                        self.settings.communication_services_connection_string
                     )
                 
+                self._alert_task = asyncio.create_task(self._drain_alert_queue())
+                
                 logger.info("Notification service initialized")
             else:
                 logger.warning("Azure Communication Service endpoint not configured")
                 
         except Exception as e:
-            logger.error(f"Failed to initialize notification service: {e}")
+            logger.error("Failed to initialize notification service: %s", e)
     
     async def send_notification(
         self,
@@ -68,25 +156,169 @@ class NotificationService:
         Returns:
             True if sent successfully, False otherwise
         """
+        # Channels are independent, so deliver to all of them concurrently
+        channels = [c for c in notification.channels if c in self._channel_senders]
+        results = await asyncio.gather(
+            *(self._channel_senders[c](notification) for c in channels),
+            return_exceptions=True
+        )
+        
         success = True
+        for channel, result in zip(channels, results):
+            if isinstance(result, BaseException):
+                logger.error("Failed to send %s notification: %s", channel, result)
+                success = False
+            elif not result:
+                success = False
+        
+        return success
+    
+    async def send_bulk(self, notifications: List[Notification]) -> bool:
+        """
+        Send many notifications with as few ACS requests as possible.
+        
+        Emails with identical content for the same tenant share one message, and
+        SMS with identical text share one send call, up to the ACS recipient limits.
+        
+        Args:
+            notifications: Notifications to send
+        
+        Returns:
+            True if every notification was sent successfully, False otherwise
+        """
+        email_groups: Dict[Tuple[str, str, str, str], List[Notification]] = defaultdict(list)
+        sms_groups: Dict[str, List[Notification]] = defaultdict(list)
+        in_app: List[Notification] = []
         
-        for channel in notification.channels:
-            if channel == NotificationChannel.EMAIL:
-                result = await self._send_email(notification)
-                success = success and result
-            elif channel == NotificationChannel.SMS:
-                result = await self._send_sms(notification)
-                success = success and result
-            elif channel == NotificationChannel.IN_APP:
-                result = await self._send_in_app(notification)
-                success = success and result
+        for notification in notifications:
+            for channel in notification.channels:
+                if channel == NotificationChannel.EMAIL:
+                    key = (
+                        notification.tenant_id,
+                        notification.title,
+                        notification.message,
+                        notification.priority
+                    )
+                    email_groups[key].append(notification)
+                elif channel == NotificationChannel.SMS:
+                    sms_groups[notification.message].append(notification)
+                elif channel == NotificationChannel.IN_APP:
+                    in_app.append(notification)
+        
+        tasks = [
+            self._send_email_batch(group[i:i + EMAIL_BATCH_SIZE])
+            for group in email_groups.values()
+            for i in range(0, len(group), EMAIL_BATCH_SIZE)
+        ]
+        tasks += [
+            self._send_sms_batch(group[i:i + SMS_BATCH_SIZE])
+            for group in sms_groups.values()
+            for i in range(0, len(group), SMS_BATCH_SIZE)
+        ]
+        tasks += [self._send_in_app(notification) for notification in in_app]
+        
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        
+        success = True
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.error("Bulk notification send failed: %s", result)
+                success = False
+            elif not result:
+                success = False
         
         return success
     
+    async def _send_email_batch(self, notifications: List[Notification]) -> bool:
+        """Send one email with identical content to every recipient in the batch."""
+        if len(notifications) == 1:
+            return await self._send_email(notifications[0])
+        
+        recipients = [n.recipient for n in notifications if n.recipient]
+        if not recipients:
+            logger.warning("No email recipients specified")
+            return False
+        
+        first = notifications[0]
+        if self._mock_mode or not self.email_client:
+            logger.info(
+                "[MOCK EMAIL] To: %s recipients, Subject: %s", len(recipients), first.title
+            )
+            return True
+        
+        try:
+            message = self._build_email_message(recipients, first)
+            
+            await asyncio.to_thread(
+                lambda: self.email_client.begin_send(message).result()
+            )
+            
+            logger.info("Email sent to %s recipients: %s", len(recipients), first.title)
+            return True
+            
+        except Exception as e:
+            logger.error("Failed to send batch email: %s", e)
+            return False
+    
+    async def _send_sms_batch(self, notifications: List[Notification]) -> bool:
+        """Send one SMS with identical text to every recipient in the batch."""
+        if len(notifications) == 1:
+            return await self._send_sms(notifications[0])
+        
+        recipients = [n.recipient for n in notifications if n.recipient]
+        if not recipients:
+            logger.warning("No SMS recipients specified")
+            return False
+        
+        if self._mock_mode or not self.sms_client:
+            logger.info(
+                "[MOCK SMS] To: %s recipients, Message: %.50s...",
+                len(recipients), notifications[0].message
+            )
+            return True
+        
+        try:
+            await asyncio.to_thread(
+                self.sms_client.send,
+                from_=self._sender_phone,
+                to=recipients,
+                message=_sms_text(notifications[0].message)
+            )
+            
+            logger.info("SMS sent to %s recipients", len(recipients))
+            return True
+            
+        except Exception as e:
+            logger.error("Failed to send batch SMS: %s", e)
+            return False
+    
+    async def _drain_alert_queue(self) -> None:
+        """Send queued alerts in batches every ALERT_BATCH_INTERVAL_SECONDS until stopped."""
+        while not self._alert_stop.is_set():
+            try:
+                await asyncio.wait_for(self._alert_stop.wait(), ALERT_BATCH_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            await self._send_queued_alerts()
+        # Alerts queued while the last batch was in flight
+        await self._send_queued_alerts()
+    
+    async def _send_queued_alerts(self) -> None:
+        """Send every alert currently waiting in the queue as one bulk send."""
+        batch = []
+        while not self._alert_queue.empty():
+            batch.append(self._alert_queue.get_nowait())
+        
+        if batch:
+            try:
+                await self.send_bulk(batch)
+            except Exception as e:
+                logger.error("Failed to send queued alerts: %s", e)
+    
     async def _send_email(self, notification: Notification) -> bool:
         """Send email notification."""
         if self._mock_mode or not self.email_client:
-            logger.info(f"[MOCK EMAIL] To: {notification.recipient}, Subject: {notification.title}")
+            logger.info("[MOCK EMAIL] To: %s, Subject: %s", notification.recipient, notification.title)
             return True
         
         try:
@@ -95,33 +327,26 @@ class NotificationService:
                 return False
             
             # Construct email message
-            message = {
-                "senderAddress": self.settings.notification_sender_email or "noreply@enterprisemcp.com",
-                "recipients": {
-                    "to": [{"address": notification.recipient}]
-                },
-                "content": {
-                    "subject": notification.title,
-                    "plainText": notification.message,
-                    "html": self._format_html_email(notification)
-                }
-            }
+            message = self._build_email_message([notification.recipient], notification)
             
-            # Send email
-            poller = self.email_client.begin_send(message)
-            result = poller.result()
+            # Send email; the sync client blocks until delivery, so wait in a worker thread
+            result = await asyncio.to_thread(
+                lambda: self.email_client.begin_send(message).result()
+            )
             
-            logger.info(f"Email sent to {notification.recipient}: {notification.title}")
+            logger.info("Email sent to %s: %s", notification.recipient, notification.title)
             return True
             
         except Exception as e:
-            logger.error(f"Failed to send email: {e}")
+            logger.error("Failed to send email: %s", e)
             return False
     
     async def _send_sms(self, notification: Notification) -> bool:
         """Send SMS notification."""
         if self._mock_mode or not self.sms_client:
-            logger.info(f"[MOCK SMS] To: {notification.recipient}, Message: {notification.message[:50]}...")
+            logger.info(
+                "[MOCK SMS] To: %s, Message: %.50s...", notification.recipient, notification.message
+            )
             return True
         
         try:
@@ -129,68 +354,60 @@ class NotificationService:
                 logger.warning("No SMS recipient specified")
                 return False
             
-            # Send SMS
-            response = self.sms_client.send(
-                from_=self.settings.notification_sender_phone or "+1234567890",
+            # Send SMS (blocking client call, run in a worker thread)
+            response = await asyncio.to_thread(
+                self.sms_client.send,
+                from_=self._sender_phone,
                 to=[notification.recipient],
-                message=notification.message[:160]  # SMS character limit
+                message=_sms_text(notification.message)
             )
             
-            logger.info(f"SMS sent to {notification.recipient}")
+            logger.info("SMS sent to %s", notification.recipient)
             return True
             
         except Exception as e:
-            logger.error(f"Failed to send SMS: {e}")
+            logger.error("Failed to send SMS: %s", e)
             return False
     
     async def _send_in_app(self, notification: Notification) -> bool:
         """Store in-app notification."""
         # In production, this would write to a database
-        logger.info(f"[IN-APP] Tenant: {notification.tenant_id}, Title: {notification.title}")
+        logger.info("[IN-APP] Tenant: %s, Title: %s", notification.tenant_id, notification.title)
         return True
     
+    def _build_email_message(
+        self,
+        recipients: List[str],
+        notification: Notification
+    ) -> Dict[str, Any]:
+        """Build an ACS email message for a notification from the shared skeleton."""
+        message = self._email_skeleton.copy()
+        message["recipients"] = {
+            "to": [{"address": recipient} for recipient in recipients]
+        }
+        message["content"] = {
+            "subject": notification.title,
+            "plainText": notification.message,
+            "html": self._format_html_email(notification)
+        }
+        return message
+    
     def _format_html_email(self, notification: Notification) -> str:
         """Format notification as HTML email."""
-        priority_colors = {
-            NotificationPriority.LOW: "#6c757d",
-            NotificationPriority.MEDIUM: "#0d6efd",
-            NotificationPriority.HIGH: "#ffc107",
-            NotificationPriority.CRITICAL: "#dc3545"
-        }
-        
-        color = priority_colors.get(notification.priority, "#6c757d")
+        color = _PRIORITY_COLORS.get(notification.priority, "#6c757d")
+        metadata_block = (
+            f'<p><strong>Metadata:</strong> {notification.metadata}</p>'
+            if notification.metadata else ''
+        )
         
-        html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .header {{ background-color: {color}; color: white; padding: 20px; text-align: center; }}
-                .content {{ padding: 20px; }}
-                .footer {{ background-color: #f8f9fa; padding: 10px; text-align: center; font-size: 12px; color: #6c757d; }}
-                .priority {{ display: inline-block; padding: 5px 10px; border-radius: 3px; font-weight: bold; }}
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1>{notification.title}</h1>
-            </div>
-            <div class="content">
-                <p><span class="priority" style="background-color: {color}; color: white;">
-                    {notification.priority.value.upper()}
-                </span></p>
-                <p>{notification.message}</p>
-                {f'<p><strong>Metadata:</strong> {notification.metadata}</p>' if notification.metadata else ''}
-            </div>
-            <div class="footer">
-                <p>Enterprise MCP - Automated Notification</p>
-                <p>Sent at {notification.created_at.strftime('%Y-%m-%d %H:%M:%S UTC')}</p>
-            </div>
-        </body>
-        </html>
-        """
-        return html
+        return _HTML_EMAIL_TEMPLATE.substitute(
+            color=color,
+            title=notification.title,
+            priority=notification.priority.value.upper(),
+            message=notification.message,
+            metadata_block=metadata_block,
+            timestamp=notification.created_at.strftime('%Y-%m-%d %H:%M:%S UTC')
+        )
     
     async def send_budget_alert(
         self,
@@ -211,20 +428,34 @@ class NotificationService:
             usage_percent: Usage percentage
         
         Returns:
-            True if sent successfully
+            True if sent successfully, or if the alert was queued for the next
+            batch (delivery failures are then only logged)
         """
+        if self._mock_mode:
+            logger.info("[MOCK ALERT] Budget: %s at %.1f%%", tenant_id, usage_percent)
+            return True
+        
         priority = NotificationPriority.HIGH if usage_percent >= 95 else NotificationPriority.MEDIUM
         
-        notification = Notification(
+        # All fields, including the required id and type, come from trusted
+        # values built here, so skip validation
+        notification = Notification.model_construct(
+            id=str(uuid.uuid4()),
+            type=NotificationType.BUDGET_ALERT,
             tenant_id=tenant_id,
             title=f"Budget Alert: {usage_percent:.1f}% Used",
             message=f"Your tenant has used ${current_cost:.2f} of ${budget_limit:.2f} budget ({usage_percent:.1f}%). Please review your usage.",
             priority=priority,
-            channels=[NotificationChannel.EMAIL, NotificationChannel.IN_APP],
+            channels=list(_EMAIL_AND_IN_APP),
             recipient=recipient,
             created_at=datetime.utcnow()
         )
         
+        # Batch alerts raised around the same time into shared ACS requests
+        if self._alert_task is not None:
+            self._alert_queue.put_nowait(notification)
+            return True
+        
         return await self.send_notification(notification)
     
     async def send_rate_limit_alert(
@@ -246,12 +477,18 @@ class NotificationService:
         Returns:
             True if sent successfully
         """
-        notification = Notification(
+        if self._mock_mode:
+            logger.info("[MOCK ALERT] Rate limit: %s exceeded %s", tenant_id, limit_type)
+            return True
+        
+        notification = Notification.model_construct(
+            id=str(uuid.uuid4()),
+            type=NotificationType.RATE_LIMIT,
             tenant_id=tenant_id,
             title=f"Rate Limit Exceeded: {limit_type}",
             message=f"Your tenant has exceeded the {limit_type} rate limit of {limit_value} requests. Some requests may be throttled.",
             priority=NotificationPriority.MEDIUM,
-            channels=[NotificationChannel.IN_APP],
+            channels=list(_IN_APP_ONLY),
             recipient=recipient,
             created_at=datetime.utcnow()
         )
@@ -277,14 +514,36 @@ class NotificationService:
         Returns:
             True if sent successfully
         """
-        notification = Notification(
+        if self._mock_mode:
+            logger.info("[MOCK ALERT] System: %s", tenant_id)
+            return True
+        
+        notification = Notification.model_construct(
+            id=str(uuid.uuid4()),
+            type=NotificationType.SYSTEM,
             tenant_id=tenant_id,
             title="System Alert",
             message=alert_message,
             priority=priority,
-            channels=[NotificationChannel.EMAIL, NotificationChannel.IN_APP],
+            channels=list(_EMAIL_AND_IN_APP),
             recipient=recipient,
             created_at=datetime.utcnow()
         )
         
         return await self.send_notification(notification)
+    
+    async def close(self) -> None:
+        """Stop the alert batching task after it has sent any alerts still queued."""
+        if self._alert_task is not None:
+            # New alerts are sent directly from here on
+            task, self._alert_task = self._alert_task, None
+            self._alert_stop.set()
+            try:
+                # Lets the current batch finish and the queue drain; cancels on timeout
+                await asyncio.wait_for(task, ALERT_SHUTDOWN_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                logger.warning(
+                    "Alert queue not drained within %ss; %d alerts dropped",
+                    ALERT_SHUTDOWN_TIMEOUT_SECONDS, self._alert_queue.qsize()
+                )
+            logger.info("Notification service closed")
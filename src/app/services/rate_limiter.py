@@ -2,9 +2,12 @@
 Rate limiting service with Redis backend.
 Supports per-tenant rate limits: RPM (requests per minute), RPD (requests per day), and monthly quotas.
 """
+import asyncio
 import logging
-from typing import Optional
-from datetime import datetime, timedelta
+import socket
+import time
+import uuid
+from typing import Dict, List, Optional
 import redis.asyncio as redis
 from redis.asyncio import Redis
 
@@ -13,6 +16,179 @@ from ..config import Settings
 logger = logging.getLogger(__name__)
 
 
+# Atomically check every counter against its limit and, if all pass, record the request.
+# KEYS: rpm window, rpd[, monthly], tenant index set; ARGV: one limit per
+# counter, one TTL per counter, the index TTL, the number of requests already
+# admitted locally (applied unconditionally before the check), the time in ms
+# the first of those was admitted, the current time in ms and a unique request id.
+# Locally admitted requests are scored with their admission time, so ones
+# older than the window count towards daily/monthly quotas but not RPM.
+# RPM is a sliding one-minute window kept as a sorted set of request
+# timestamps; daily and monthly quotas are fixed-window counters. Newly created
+# keys are added to the index so reset_limits can find them without scanning
+# the keyspace.
+# Returns {exceeded, counts...}: exceeded is 0 when allowed, otherwise the
+# 1-based index of the first exceeded counter.
+_CHECK_AND_RECORD_LUA = """
+local n = #KEYS - 1
+local index = KEYS[n + 1]
+local index_ttl = tonumber(ARGV[2 * n + 1])
+local pending = tonumber(ARGV[2 * n + 2])
+local pending_ms = tonumber(ARGV[2 * n + 3])
+local now_ms = tonumber(ARGV[2 * n + 4])
+local request_id = ARGV[2 * n + 5]
+local seq = 0
+
+local function track(key)
+    redis.call('SADD', index, key)
+    redis.call('EXPIRE', index, index_ttl)
+end
+
+local function add(i, amount, score)
+    local ttl = tonumber(ARGV[n + i])
+    if i == 1 then
+        if score <= now_ms - 60000 then
+            return redis.call('ZCARD', KEYS[1])
+        end
+        for _ = 1, amount do
+            seq = seq + 1
+            redis.call('ZADD', KEYS[1], score, request_id .. ':' .. seq)
+        end
+        redis.call('EXPIRE', KEYS[1], ttl)
+        local count = redis.call('ZCARD', KEYS[1])
+        if count == amount then
+            track(KEYS[1])
+        end
+        return count
+    end
+    local count = redis.call('INCRBY', KEYS[i], amount)
+    if count == amount then
+        redis.call('EXPIRE', KEYS[i], ttl)
+        track(KEYS[i])
+    end
+    return count
+end
+
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, now_ms - 60000)
+
+local counts = {}
+for i = 1, n do
+    if pending > 0 then
+        counts[i] = add(i, pending, pending_ms)
+    elseif i == 1 then
+        counts[i] = redis.call('ZCARD', KEYS[1])
+    else
+        counts[i] = tonumber(redis.call('GET', KEYS[i]) or '0')
+    end
+end
+for i = 1, n do
+    if counts[i] >= tonumber(ARGV[i]) then
+        return {i, unpack(counts)}
+    end
+end
+for i = 1, n do
+    counts[i] = add(i, 1, now_ms)
+end
+return {0, unpack(counts)}
+"""
+
+# Local admission: requests are admitted in-process while every counter is
+# below this fraction of its limit, and synced to Redis every LOCAL_BATCH_SIZE
+# requests or LOCAL_SYNC_SECONDS, whichever comes first. Over-admission is
+# bounded by the batch size times the number of workers.
+LOCAL_ADMIT_RATIO = 0.8
+LOCAL_BATCH_SIZE = 16
+LOCAL_SYNC_SECONDS = 0.25
+LOCAL_CACHE_SIZE = 10_000
+
+# Lock stripes serializing Redis syncs per tenant (power of two so the index is a mask)
+_LOCK_SHARDS = 256
+
+# TCP keepalive probes for pooled Redis connections (options are platform-specific)
+_KEEPALIVE_OPTIONS = {
+    option: value
+    for name, value in (("TCP_KEEPIDLE", 30), ("TCP_KEEPINTVL", 10), ("TCP_KEEPCNT", 3))
+    if (option := getattr(socket, name, None)) is not None
+}
+
+# Maximum keys per DEL when resetting a tenant
+_DELETE_CHUNK_SIZE = 512
+
+# TTL of the per-tenant key index; outlives the longest-lived counter (monthly)
+_INDEX_TTL_SECONDS = 32 * 86400
+
+
+# Integer day/month buckets for daily and monthly keys. Days are whole UTC
+# days since the epoch; the calendar month (months since year 0) is only
+# recomputed when the day changes.
+_bucket_cache = {"day": -1, "month": 0}
+
+
+def _date_buckets() -> tuple[int, int]:
+    """Get the current UTC (day, month) buckets for daily/monthly keys."""
+    day = int(time.time()) // 86400
+    if day != _bucket_cache["day"]:
+        now = time.gmtime(day * 86400)
+        _bucket_cache.update(day=day, month=now.tm_year * 12 + now.tm_mon - 1)
+    return _bucket_cache["day"], _bucket_cache["month"]
+
+
+def _rpm_window_key(tenant_id: str) -> str:
+    """Redis sorted set of request timestamps in a tenant's sliding RPM window."""
+    return f"ratelimit:rpm-window:{tenant_id}"
+
+
+def _index_key(tenant_id: str) -> str:
+    """Redis set holding every rate limit key created for a tenant."""
+    return f"ratelimit:index:{tenant_id}"
+
+
+class _LocalQuota:
+    """Last known Redis counters for a tenant plus requests admitted since."""
+    
+    __slots__ = ("keys", "limits", "ttls", "counts", "pending", "pending_ms", "synced_at")
+    
+    def __init__(self, keys: List[str], limits: List[int], ttls: List[int], counts: List[int]):
+        self.keys = keys
+        self.limits = limits
+        self.ttls = ttls
+        self.counts = counts
+        self.pending = 0
+        self.pending_ms = 0  # wall-clock ms of the oldest pending admission
+        self.synced_at = time.monotonic()
+    
+    def admit(self) -> None:
+        """Count a request admitted without asking Redis."""
+        if not self.pending:
+            self.pending_ms = int(time.time() * 1000)
+        self.pending += 1
+    
+    def take_pending(self) -> tuple[int, int]:
+        """Hand over the pending requests and their first admission time."""
+        taken = (self.pending, self.pending_ms)
+        self.pending = 0
+        return taken
+    
+    def restore_pending(self, pending: int, pending_ms: int) -> None:
+        """Put back requests that could not be synced to Redis."""
+        if pending:
+            self.pending_ms = min(self.pending_ms, pending_ms) if self.pending else pending_ms
+            self.pending += pending
+    
+    def can_admit(self, keys: List[str], limits: List[int]) -> bool:
+        """Whether a request can be admitted without asking Redis."""
+        return (
+            self.pending < LOCAL_BATCH_SIZE - 1
+            and time.monotonic() - self.synced_at < LOCAL_SYNC_SECONDS
+            and self.keys == keys
+            and self.limits == limits
+            and all(
+                count + self.pending < limit * LOCAL_ADMIT_RATIO
+                for count, limit in zip(self.counts, limits)
+            )
+        )
+
+
 class RateLimiter:
     """Redis-backed rate limiter with multi-level quotas."""
     
@@ -20,6 +196,10 @@ class RateLimiter:
         """Initialize rate limiter."""
         self.settings = settings
         self.redis_client: Optional[Redis] = None
+        self._check_and_record_script = None
+        self._local: Dict[str, _LocalQuota] = {}
+        self._locks = [asyncio.Lock() for _ in range(_LOCK_SHARDS)]
+        self._flush_task: Optional[asyncio.Task] = None
         self._initialized = False
     
     async def initialize(self) -> None:
@@ -33,21 +213,37 @@ class RateLimiter:
             return
         
         try:
+            # Pooled keepalive connections; redis-py parses replies with hiredis when installed.
+            # Replies stay as bytes: every value read here is an integer, and int() accepts bytes.
             self.redis_client = await redis.from_url(
                 self.settings.redis_url,
                 encoding="utf-8",
-                decode_responses=True
+                max_connections=64,
+                socket_keepalive=True,
+                socket_keepalive_options=_KEEPALIVE_OPTIONS,
+                health_check_interval=30,
+                retry_on_timeout=True
             )
             # Test connection
             await self.redis_client.ping()
+            
+            # Load the fused check/record script once; later calls use EVALSHA
+            self._check_and_record_script = self.redis_client.register_script(
+                _CHECK_AND_RECORD_LUA
+            )
+            await self.redis_client.script_load(_CHECK_AND_RECORD_LUA)
+            
+            # Sync local admissions even for tenants that go quiet, so other
+            # workers and usage stats see them and a crash loses at most one interval
+            self._flush_task = asyncio.create_task(self._flush_loop())
             logger.info("Rate limiter initialized with Redis")
             self._initialized = True
         except Exception as e:
-            logger.error(f"Failed to initialize rate limiter: {e}")
+            logger.error("Failed to initialize rate limiter: %s", e)
             logger.warning("Rate limiter will run in mock mode")
             self._initialized = True
     
-    async def check_rate_limit(
+    async def check_and_record(
         self,
         tenant_id: str,
         rpm_limit: int,
@@ -55,7 +251,7 @@ class RateLimiter:
         monthly_limit: Optional[int] = None
     ) -> tuple[bool, Optional[str]]:
         """
-        Check if request is within rate limits.
+        Check rate limits and, if allowed, record the request in one atomic Redis call.
         
         Args:
             tenant_id: Tenant identifier
@@ -66,82 +262,149 @@ class RateLimiter:
         Returns:
             Tuple of (allowed: bool, reason: Optional[str])
         """
-        if self.redis_client is None:
+        if self.redis_client is None or self._check_and_record_script is None:
             # Mock mode - always allow
             return True, None
         
         try:
-            # Check RPM (requests per minute)
-            rpm_key = f"ratelimit:rpm:{tenant_id}"
-            rpm_count = await self.redis_client.get(rpm_key)
+            day, month = _date_buckets()
+            keys = [
+                _rpm_window_key(tenant_id),
+                f"ratelimit:rpd:{tenant_id}:{day}"
+            ]
+            limits = [rpm_limit, rpd_limit]
+            ttls = [60, 86400]
+            if monthly_limit:
+                keys.append(f"ratelimit:monthly:{tenant_id}:{month}")
+                limits.append(monthly_limit)
+                ttls.append(31 * 86400)
             
-            if rpm_count and int(rpm_count) >= rpm_limit:
-                return False, f"Rate limit exceeded: {rpm_limit} requests per minute"
+            # Admit locally while the tenant is well under every limit
+            entry = self._local.get(tenant_id)
+            if entry is not None and entry.can_admit(keys, limits):
+                entry.admit()
+                return True, None
             
-            # Check RPD (requests per day)
-            rpd_key = f"ratelimit:rpd:{tenant_id}:{datetime.utcnow().strftime('%Y-%m-%d')}"
-            rpd_count = await self.redis_client.get(rpd_key)
+            # Only one task per tenant syncs with Redis at a time; tenants on
+            # other stripes proceed in parallel
+            evicted = None
+            async with self._tenant_lock(tenant_id):
+                # Another task may have refreshed the local view while we waited
+                entry = self._local.get(tenant_id)
+                if entry is not None and entry.can_admit(keys, limits):
+                    entry.admit()
+                    return True, None
+                
+                # Hand locally admitted requests to Redis with this check; if the
+                # counters rolled over since, settle them against the old keys first
+                pending, pending_ms = 0, 0
+                if entry is not None and entry.pending:
+                    if entry.keys == keys:
+                        pending, pending_ms = entry.take_pending()
+                    else:
+                        await self._flush_entry(tenant_id, entry)
+                
+                now_ms = int(time.time() * 1000)
+                try:
+                    exceeded, *counts = await self._check_and_record_script(
+                        keys=keys + [_index_key(tenant_id)],
+                        args=limits + ttls + [
+                            _INDEX_TTL_SECONDS,
+                            pending,
+                            pending_ms,
+                            now_ms,
+                            uuid.uuid4().hex
+                        ]
+                    )
+                except BaseException:
+                    # Including cancellation, so admitted requests are not dropped
+                    if entry is not None:
+                        entry.restore_pending(pending, pending_ms)
+                    raise
+                
+                # Refresh the local view, moving over requests admitted while
+                # awaiting Redis so the old entry cannot flush them a second time
+                fresh = _LocalQuota(keys, limits, ttls, counts)
+                if entry is not None and entry.keys == keys:
+                    fresh.restore_pending(*entry.take_pending())
+                self._local.pop(tenant_id, None)
+                self._local[tenant_id] = fresh
+                if len(self._local) > LOCAL_CACHE_SIZE:
+                    evicted = next(iter(self._local))
             
-            if rpd_count and int(rpd_count) >= rpd_limit:
-                return False, f"Daily quota exceeded: {rpd_limit} requests per day"
+            # Flushed under the evicted tenant's own lock, taken after releasing
+            # ours since both may share a stripe
+            if evicted is not None:
+                await self._evict(evicted)
             
-            # Check monthly limit if specified
-            if monthly_limit:
-                monthly_key = f"ratelimit:monthly:{tenant_id}:{datetime.utcnow().strftime('%Y-%m')}"
-                monthly_count = await self.redis_client.get(monthly_key)
-                
-                if monthly_count and int(monthly_count) >= monthly_limit:
-                    return False, f"Monthly quota exceeded: {monthly_limit} requests per month"
+            if exceeded == 1:
+                return False, f"Rate limit exceeded: {rpm_limit} requests per minute"
+            if exceeded == 2:
+                return False, f"Daily quota exceeded: {rpd_limit} requests per day"
+            if exceeded == 3:
+                return False, f"Monthly quota exceeded: {monthly_limit} requests per month"
             
+            logger.debug("Recorded request for tenant %s", tenant_id)
             return True, None
             
         except Exception as e:
-            logger.error(f"Rate limit check failed for {tenant_id}: {e}")
+            logger.error("Rate limit check failed for %s: %s", tenant_id, e)
             # Fail open - allow request if rate limiter has issues
             return True, None
     
-    async def record_request(
-        self,
-        tenant_id: str,
-        rpm_limit: int,
-        rpd_limit: int,
-        monthly_limit: Optional[int] = None
-    ) -> None:
-        """
-        Record a request and update rate limit counters.
-        
-        Args:
-            tenant_id: Tenant identifier
-            rpm_limit: Requests per minute limit (for TTL)
-            rpd_limit: Requests per day limit (for TTL)
-            monthly_limit: Optional monthly request limit
-        """
+    def _tenant_lock(self, tenant_id: str) -> asyncio.Lock:
+        """Lock stripe serializing a tenant's Redis syncs."""
+        return self._locks[hash(tenant_id) & (_LOCK_SHARDS - 1)]
+    
+    async def _evict(self, tenant_id: str) -> None:
+        """Drop a tenant's local view, pushing its pending requests to Redis first."""
+        async with self._tenant_lock(tenant_id):
+            entry = self._local.pop(tenant_id, None)
+            if entry is not None and entry.pending:
+                await self._flush_entry(tenant_id, entry)
+    
+    async def _flush_entry(self, tenant_id: str, entry: _LocalQuota) -> None:
+        """Add a tenant's locally admitted requests to its Redis counters."""
+        pending, pending_ms = entry.take_pending()
+        try:
+            # Zero limits make the script apply the pending increments (setting
+            # TTLs on counters it creates) without admitting another request
+            await self._check_and_record_script(
+                keys=entry.keys + [_index_key(tenant_id)],
+                args=[0] * len(entry.keys) + entry.ttls + [
+                    _INDEX_TTL_SECONDS,
+                    pending,
+                    pending_ms,
+                    int(time.time() * 1000),
+                    uuid.uuid4().hex
+                ]
+            )
+        except BaseException:
+            entry.restore_pending(pending, pending_ms)
+            raise
+    
+    async def flush(self) -> None:
+        """Push all locally admitted requests to Redis."""
         if self.redis_client is None:
             return
         
-        try:
-            # Increment RPM counter
-            rpm_key = f"ratelimit:rpm:{tenant_id}"
-            await self.redis_client.incr(rpm_key)
-            await self.redis_client.expire(rpm_key, 60)  # 60 seconds TTL
-            
-            # Increment RPD counter
-            rpd_key = f"ratelimit:rpd:{tenant_id}:{datetime.utcnow().strftime('%Y-%m-%d')}"
-            await self.redis_client.incr(rpd_key)
-            await self.redis_client.expire(rpd_key, 86400)  # 24 hours TTL
-            
-            # Increment monthly counter if tracking
-            if monthly_limit:
-                monthly_key = f"ratelimit:monthly:{tenant_id}:{datetime.utcnow().strftime('%Y-%m')}"
-                await self.redis_client.incr(monthly_key)
-                # Set TTL to end of next month
-                days_in_month = 31
-                await self.redis_client.expire(monthly_key, days_in_month * 86400)
-            
-            logger.debug(f"Recorded request for tenant {tenant_id}")
-            
-        except Exception as e:
-            logger.error(f"Failed to record request for {tenant_id}: {e}")
+        for tenant_id in [tid for tid, entry in self._local.items() if entry.pending]:
+            try:
+                async with self._tenant_lock(tenant_id):
+                    # Re-read under the lock: the entry may have been replaced or evicted
+                    entry = self._local.get(tenant_id)
+                    if entry is not None and entry.pending:
+                        await self._flush_entry(tenant_id, entry)
+            except Exception as e:
+                logger.error(
+                    "Failed to flush local rate limit counters for %s: %s", tenant_id, e
+                )
+    
+    async def _flush_loop(self) -> None:
+        """Push locally admitted requests to Redis every LOCAL_SYNC_SECONDS."""
+        while True:
+            await asyncio.sleep(LOCAL_SYNC_SECONDS)
+            await self.flush()
     
     async def get_usage_stats(self, tenant_id: str) -> dict:
         """
@@ -162,13 +425,15 @@ class RateLimiter:
             }
         
         try:
-            rpm_key = f"ratelimit:rpm:{tenant_id}"
-            rpd_key = f"ratelimit:rpd:{tenant_id}:{datetime.utcnow().strftime('%Y-%m-%d')}"
-            monthly_key = f"ratelimit:monthly:{tenant_id}:{datetime.utcnow().strftime('%Y-%m')}"
+            day, month = _date_buckets()
+            rpd_key = f"ratelimit:rpd:{tenant_id}:{day}"
+            monthly_key = f"ratelimit:monthly:{tenant_id}:{month}"
             
-            rpm_count = await self.redis_client.get(rpm_key)
-            rpd_count = await self.redis_client.get(rpd_key)
-            monthly_count = await self.redis_client.get(monthly_key)
+            now_ms = int(time.time() * 1000)
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.zcount(_rpm_window_key(tenant_id), now_ms - 60000, "+inf")
+                pipe.mget(rpd_key, monthly_key)
+                rpm_count, (rpd_count, monthly_count) = await pipe.execute()
             
             return {
                 "rpm": int(rpm_count) if rpm_count else 0,
@@ -178,7 +443,7 @@ class RateLimiter:
             }
             
         except Exception as e:
-            logger.error(f"Failed to get usage stats for {tenant_id}: {e}")
+            logger.error("Failed to get usage stats for %s: %s", tenant_id, e)
             return {
                 "rpm": 0,
                 "rpd": 0,
@@ -200,24 +465,38 @@ class RateLimiter:
             return True  # Mock mode
         
         try:
-            # Find and delete all keys for this tenant
-            pattern = f"ratelimit:*:{tenant_id}*"
-            keys = []
-            async for key in self.redis_client.scan_iter(match=pattern):
-                keys.append(key)
+            # Delete every key recorded in the tenant's index, and the index itself
+            index_key = _index_key(tenant_id)
+            keys = list(await self.redis_client.smembers(index_key))
             
             if keys:
-                await self.redis_client.delete(*keys)
-                logger.info(f"Reset rate limits for tenant {tenant_id}: {len(keys)} keys deleted")
+                keys.append(index_key)
+            else:
+                # No index yet (keys written before it existed): fall back to a scan
+                pattern = f"ratelimit:*:{tenant_id}*"
+                async for key in self.redis_client.scan_iter(match=pattern, count=1000):
+                    keys.append(key)
+            
+            # Delete in chunks to stay well within Redis argument limits
+            for i in range(0, len(keys), _DELETE_CHUNK_SIZE):
+                await self.redis_client.delete(*keys[i:i + _DELETE_CHUNK_SIZE])
+            
+            if keys:
+                logger.info("Reset rate limits for tenant %s: %s keys deleted", tenant_id, len(keys))
             
             return True
             
         except Exception as e:
-            logger.error(f"Failed to reset limits for {tenant_id}: {e}")
+            logger.error("Failed to reset limits for %s: %s", tenant_id, e)
             return False
     
     async def close(self) -> None:
         """Close Redis connection."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        
         if self.redis_client:
+            await self.flush()
             await self.redis_client.close()
             logger.info("Rate limiter closed")
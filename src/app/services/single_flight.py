@@ -0,0 +1,31 @@
+"""
+Shared coalescing of concurrent identical async fetches.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+async def single_flight(
+    inflight: Dict[Hashable, asyncio.Future],
+    key: Hashable,
+    fetch: Callable[[], Awaitable[Any]]
+) -> Any:
+    """
+    Run fetch() once for all concurrent callers using the same key.
+
+    Args:
+        inflight: Caller-owned map of keys to fetches still running
+        key: Identifies the fetch; callers with equal keys share one result
+        fetch: Zero-argument coroutine function doing the actual work
+
+    Returns:
+        Result of the shared fetch
+    """
+    future = inflight.get(key)
+    if future is None:
+        future = asyncio.ensure_future(fetch())
+        inflight[key] = future
+        future.add_done_callback(lambda _: inflight.pop(key, None))
+
+    # Shield so a cancelled caller does not cancel the shared fetch
+    return await asyncio.shield(future)
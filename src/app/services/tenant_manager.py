@@ -2,20 +2,38 @@
 Tenant management service.
 Handles tenant registry, configuration loading from Key Vault, and caching.
 """
-import json
+import asyncio
 import logging
+import time
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
-from azure.core.exceptions import ResourceNotFoundError
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
+from pydantic import TypeAdapter
 
 from ..config import Settings
 from ..models.tenant import TenantConfig, TenantRegistry
+from .azure_auth import get_credential
+from .single_flight import single_flight
+
+if TYPE_CHECKING:
+    from azure.keyvault.secrets import SecretClient
 
 logger = logging.getLogger(__name__)
 
+# Validators built once; validate_json parses secret payloads in pydantic-core
+_TENANT_CONFIG_ADAPTER = TypeAdapter(TenantConfig)
+_TENANT_REGISTRY_ADAPTER = TypeAdapter(TenantRegistry)
+_TENANT_LIST_ADAPTER = TypeAdapter(List[TenantConfig])
+
+# Cap on concurrent Key Vault secret fetches, well under the vault's
+# 2000 transactions / 10s throttling limit
+KV_FETCH_CONCURRENCY = 16
+
+# Bounds for the tenant config cache; misses are cached briefly so unknown
+# tenant ids do not hit Key Vault on every request
+TENANT_CACHE_MAXSIZE = 1024
+NEGATIVE_CACHE_TTL_SECONDS = 30
 
 class TenantManager:
     """Manages tenant configurations and Key Vault integration."""
@@ -24,18 +42,41 @@ class TenantManager:
     TENANT_CONFIG_PREFIX = "tenant-"
     TENANT_CONFIG_SUFFIX = "-config"
     
-    def __init__(self, settings: Settings):
-        """Initialize tenant manager."""
+    def __init__(self, settings: Settings, kv_client: Optional["SecretClient"] = None):
+        """
+        Initialize tenant manager.
+        
+        Args:
+            settings: Application settings
+            kv_client: Existing Key Vault client to share; built from settings if omitted
+        """
         self.settings = settings
-        self._cache: Dict[str, TenantConfig] = {}
+        # tenant_id -> (inserted monotonic time, config or None for a known miss)
+        self._cache: "OrderedDict[str, Tuple[float, Optional[TenantConfig]]]" = OrderedDict()
         self._registry: Optional[TenantRegistry] = None
-        self._cache_timestamp: Optional[datetime] = None
+        self._cache_timestamp: Optional[float] = None  # time.monotonic() of last refresh
         self._cache_ttl = 300  # 5 minutes
         self._local_tenants: Dict[str, TenantConfig] = {}
+        self._fetch_semaphore = asyncio.Semaphore(KV_FETCH_CONCURRENCY)
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        self._secret_names: Dict[str, str] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+        # Serializes registry refreshes with tenant writes so a refresh that
+        # started before a write cannot replace the registry with a stale copy
+        self._registry_lock = asyncio.Lock()
+        # Materialized list_tenants() result, cleared whenever the set changes
+        self._list_snapshot: Optional[Tuple[TenantConfig, ...]] = None
+        # Set when the in-memory registry has changes not yet written to Key Vault
+        self._registry_dirty = False
         
-        # Initialize Key Vault client
-        if settings.key_vault_url and not settings.local_mock_services:
-            credential = DefaultAzureCredential()
+        # Initialize Key Vault client; a client passed in stays owned by the caller
+        self._owns_client = kv_client is None
+        if kv_client is not None:
+            self.kv_client = kv_client
+        elif settings.key_vault_url and not settings.local_mock_services:
+            from azure.keyvault.secrets import SecretClient
+            
+            credential = get_credential()
             self.kv_client = SecretClient(
                 vault_url=settings.key_vault_url,
                 credential=credential
@@ -50,25 +91,30 @@ class TenantManager:
         import yaml
         from pathlib import Path
         
+        # libyaml's C loader when available, otherwise the pure-Python one
+        loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+        
         config_path = Path(__file__).parent.parent.parent.parent / "config" / "tenants.yaml"
         if not config_path.exists():
-            logger.warning(f"Local tenants config not found: {config_path}")
+            logger.warning("Local tenants config not found: %s", config_path)
             return
         
         try:
             with open(config_path) as f:
-                data = yaml.safe_load(f)
+                data = yaml.load(f, Loader=loader)
             
-            tenants_data = data.get("tenants", [])
-            for tenant_data in tenants_data:
-                tenant_id = tenant_data.get("id")
-                if tenant_id:
-                    tenant_config = TenantConfig(**tenant_data)
-                    self._local_tenants[tenant_id] = tenant_config
+            tenants_data = [
+                tenant_data for tenant_data in data.get("tenants", [])
+                if tenant_data.get("id")
+            ]
+            tenant_configs = _TENANT_LIST_ADAPTER.validate_python(tenants_data)
+            self._local_tenants = {
+                tenant_config.id: tenant_config for tenant_config in tenant_configs
+            }
             
-            logger.info(f"Loaded {len(self._local_tenants)} tenants from local config")
+            logger.info("Loaded %s tenants from local config", len(self._local_tenants))
         except Exception as e:
-            logger.error(f"Failed to load local tenants: {e}")
+            logger.error("Failed to load local tenants: %s", e)
     
     async def initialize(self) -> None:
         """Initialize tenant manager, load registry from Key Vault."""
@@ -78,16 +124,32 @@ class TenantManager:
         if self.kv_client is None:
             tenant_ids = list(self._local_tenants.keys())
             self._registry = TenantRegistry(tenants=tenant_ids)
-            logger.info(f"Initialized with {len(tenant_ids)} local tenants: {tenant_ids}")
+            logger.info("Initialized with %s local tenants: %s", len(tenant_ids), tenant_ids)
             return
         
         try:
             await self.refresh_registry()
-            logger.info(f"Tenant manager initialized with {len(self._cache)} tenants")
+            logger.info(
+                "Tenant manager initialized with %s tenants", self.get_cached_tenant_count()
+            )
         except Exception as e:
-            logger.error(f"Failed to initialize tenant manager: {e}")
+            logger.error("Failed to initialize tenant manager: %s", e)
             if not self.settings.local_dev_mode:
                 raise
+        
+        # Keep the cache warm so requests are served from memory, treating
+        # Key Vault as cold storage rather than a per-request lookup
+        self._refresh_task = asyncio.create_task(self._background_refresh_loop())
+    
+    async def _background_refresh_loop(self) -> None:
+        """Re-load the registry and all tenant configs twice per cache TTL."""
+        # Refreshing at half the TTL keeps entries from expiring before they are reloaded
+        while True:
+            await asyncio.sleep(self._cache_ttl / 2)
+            try:
+                await self.refresh_registry()
+            except Exception as e:
+                logger.error("Background tenant refresh failed: %s", e)
     
     async def refresh_registry(self) -> None:
         """Refresh tenant registry and cache from Key Vault."""
@@ -95,102 +157,221 @@ class TenantManager:
             logger.debug("Skipping registry refresh in local mode")
             return
         
+        async with self._registry_lock:
+            await self._refresh_registry()
+    
+    async def _refresh_registry(self) -> None:
+        """Load the registry and every tenant config; caller holds _registry_lock."""
+        from azure.core.exceptions import ResourceNotFoundError
+        
         try:
             # Load tenant registry
-            secret = self.kv_client.get_secret(self.REGISTRY_SECRET_NAME)
-            registry_data = json.loads(secret.value)
-            self._registry = TenantRegistry(**registry_data)
+            secret = await asyncio.to_thread(
+                self.kv_client.get_secret, self.REGISTRY_SECRET_NAME
+            )
+            self._registry = _TENANT_REGISTRY_ADAPTER.validate_json(secret.value)
             
-            # Load all tenant configurations
-            for tenant_id in self._registry.tenants:
-                await self._load_tenant_config(tenant_id)
+            # Load all tenant configurations concurrently; failures are
+            # logged per tenant inside _load_tenant_config
+            results = await asyncio.gather(
+                *(self._load_tenant_config(tenant_id) for tenant_id in self._registry.tenants),
+                return_exceptions=True
+            )
+            self._list_snapshot = tuple(
+                result for result in results if isinstance(result, TenantConfig)
+            )
             
-            self._cache_timestamp = datetime.utcnow()
-            logger.info(f"Refreshed tenant registry: {len(self._registry.tenants)} tenants")
+            self._cache_timestamp = time.monotonic()
+            logger.info("Refreshed tenant registry: %s tenants", len(self._registry.tenants))
             
         except ResourceNotFoundError:
             logger.warning("Tenant registry not found in Key Vault")
             self._registry = TenantRegistry(tenants=[])
+            self._list_snapshot = ()
         except Exception as e:
-            logger.error(f"Failed to refresh tenant registry: {e}")
+            logger.error("Failed to refresh tenant registry: %s", e)
             raise
     
+    def _secret_name(self, tenant_id: str) -> str:
+        """Get the Key Vault secret name for a tenant's config."""
+        secret_name = self._secret_names.get(tenant_id)
+        if secret_name is None:
+            secret_name = self.TENANT_CONFIG_PREFIX + tenant_id + self.TENANT_CONFIG_SUFFIX
+            # Bounded like the tenant cache, since ids come from request headers
+            if len(self._secret_names) < TENANT_CACHE_MAXSIZE:
+                self._secret_names[tenant_id] = secret_name
+        return secret_name
+    
     async def _load_tenant_config(self, tenant_id: str) -> Optional[TenantConfig]:
         """Load tenant configuration from Key Vault."""
         if self.kv_client is None:
             return None
         
-        secret_name = f"{self.TENANT_CONFIG_PREFIX}{tenant_id}{self.TENANT_CONFIG_SUFFIX}"
+        from azure.core.exceptions import ResourceNotFoundError
+        
+        secret_name = self._secret_name(tenant_id)
         
         try:
-            secret = self.kv_client.get_secret(secret_name)
-            config_data = json.loads(secret.value)
-            tenant_config = TenantConfig(**config_data)
-            self._cache[tenant_id] = tenant_config
-            logger.debug(f"Loaded tenant config: {tenant_id}")
+            async with self._fetch_semaphore:
+                secret = await asyncio.to_thread(self.kv_client.get_secret, secret_name)
+            tenant_config = _TENANT_CONFIG_ADAPTER.validate_json(secret.value)
+            self._cache_put(tenant_id, tenant_config)
+            logger.debug("Loaded tenant config: %s", tenant_id)
             return tenant_config
         except ResourceNotFoundError:
-            logger.warning(f"Tenant config not found: {tenant_id}")
+            logger.warning("Tenant config not found: %s", tenant_id)
+            self._cache_put(tenant_id, None)
             return None
         except Exception as e:
-            logger.error(f"Failed to load tenant config {tenant_id}: {e}")
+            logger.error("Failed to load tenant config %s: %s", tenant_id, e)
             return None
     
+    def _cache_get(self, tenant_id: str) -> Tuple[bool, Optional[TenantConfig]]:
+        """
+        Look up a tenant in the cache, evicting the entry if it has expired.
+        
+        Returns:
+            (hit, config) - config is None on a cached miss
+        """
+        entry = self._cache.get(tenant_id)
+        if entry is None:
+            return False, None
+        
+        inserted, tenant_config = entry
+        ttl = self._cache_ttl if tenant_config is not None else NEGATIVE_CACHE_TTL_SECONDS
+        if time.monotonic() - inserted >= ttl:
+            del self._cache[tenant_id]
+            return False, None
+        
+        self._cache.move_to_end(tenant_id)
+        return True, tenant_config
+    
+    def _cache_put(self, tenant_id: str, tenant_config: Optional[TenantConfig]) -> None:
+        """Cache a tenant config (or a miss), evicting the least recently used entry when full."""
+        self._cache[tenant_id] = (time.monotonic(), tenant_config)
+        self._cache.move_to_end(tenant_id)
+        if len(self._cache) > TENANT_CACHE_MAXSIZE:
+            self._cache.popitem(last=False)
+    
     async def get_tenant(self, tenant_id: str) -> Optional[TenantConfig]:
         """Get tenant configuration by ID."""
-        # Check cache first
-        if tenant_id in self._cache:
-            return self._cache[tenant_id]
+        # Check cache first (includes recent misses)
+        hit, tenant_config = self._cache_get(tenant_id)
+        if hit:
+            return tenant_config
         
         # In local mode, check local tenants
         if self.kv_client is None:
             tenant_config = self._local_tenants.get(tenant_id)
             if tenant_config:
-                self._cache[tenant_id] = tenant_config
+                self._cache_put(tenant_id, tenant_config)
             return tenant_config
         
-        # Try loading from Key Vault
-        tenant_config = await self._load_tenant_config(tenant_id)
-        return tenant_config
+        # Try loading from Key Vault, sharing one fetch across concurrent misses.
+        # Ids missing from the registry are still fetched (the registry can lag
+        # behind writes) and a miss is negatively cached.
+        return await single_flight(
+            self._inflight,
+            ("tenant", tenant_id),
+            lambda: self._load_tenant_config(tenant_id)
+        )
     
     async def list_tenants(self) -> List[TenantConfig]:
         """List all tenant configurations."""
-        if self._registry is None:
-            await self.refresh_registry()
+        if self._list_snapshot is None:
+            if self._registry is None:
+                await single_flight(self._inflight, ("registry",), self.refresh_registry)
+            
+            # Local mode, or the tenant set changed since the last refresh
+            tenants: List[TenantConfig] = []
+            for tenant_id in (self._registry.tenants if self._registry else []):
+                tenant_config = await self.get_tenant(tenant_id)
+                if tenant_config is not None:
+                    tenants.append(tenant_config)
+            self._list_snapshot = tuple(tenants)
         
-        return [
-            tenant_config
-            for tenant_id in (self._registry.tenants if self._registry else [])
-            if (tenant_config := await self.get_tenant(tenant_id)) is not None
-        ]
+        return list(self._list_snapshot)
     
     async def create_tenant(self, tenant_config: TenantConfig) -> TenantConfig:
         """Create new tenant configuration."""
         if self.kv_client is None:
             raise RuntimeError("Key Vault client not available")
         
-        # Validate tenant doesn't exist
-        if tenant_config.id in self._cache:
+        # Validate tenant doesn't exist; get_tenant falls back to Key Vault so
+        # an expired or evicted cache entry cannot let an overwrite through
+        if await self.get_tenant(tenant_config.id) is not None:
             raise ValueError(f"Tenant already exists: {tenant_config.id}")
         
         # Save to Key Vault
-        secret_name = f"{self.TENANT_CONFIG_PREFIX}{tenant_config.id}{self.TENANT_CONFIG_SUFFIX}"
+        secret_name = self._secret_name(tenant_config.id)
         config_json = tenant_config.model_dump_json()
         
-        try:
-            self.kv_client.set_secret(secret_name, config_json)
-            logger.info(f"Created tenant config: {tenant_config.id}")
-            
-            # Update registry
-            await self._add_to_registry(tenant_config.id)
+        async with self._registry_lock:
+            try:
+                await asyncio.to_thread(self.kv_client.set_secret, secret_name, config_json)
+                logger.info("Created tenant config: %s", tenant_config.id)
+                
+                # Update registry
+                self._add_to_registry(tenant_config.id)
+                await self.flush_registry()
+                
+                # Update cache, replacing any cached miss
+                self._cache_put(tenant_config.id, tenant_config)
+                self._list_snapshot = None
+                
+                return tenant_config
+            except Exception as e:
+                logger.error("Failed to create tenant %s: %s", tenant_config.id, e)
+                raise
+    
+    async def bulk_create_tenants(self, tenant_configs: List[TenantConfig]) -> List[TenantConfig]:
+        """
+        Create several tenants, writing the registry to Key Vault only once.
+        
+        Args:
+            tenant_configs: New tenant configurations
             
-            # Update cache
-            self._cache[tenant_config.id] = tenant_config
+        Returns:
+            The created tenant configurations
+        """
+        if self.kv_client is None:
+            raise RuntimeError("Key Vault client not available")
+        
+        existing = await asyncio.gather(
+            *(self.get_tenant(tenant_config.id) for tenant_config in tenant_configs)
+        )
+        for tenant_config, current in zip(tenant_configs, existing):
+            if current is not None:
+                raise ValueError(f"Tenant already exists: {tenant_config.id}")
+        
+        async def save(tenant_config: TenantConfig) -> None:
+            async with self._fetch_semaphore:
+                await asyncio.to_thread(
+                    self.kv_client.set_secret,
+                    self._secret_name(tenant_config.id),
+                    tenant_config.model_dump_json()
+                )
+            self._add_to_registry(tenant_config.id)
+            self._cache_put(tenant_config.id, tenant_config)
+        
+        async with self._registry_lock:
+            results = await asyncio.gather(
+                *(save(tenant_config) for tenant_config in tenant_configs),
+                return_exceptions=True
+            )
+            self._list_snapshot = None
             
-            return tenant_config
-        except Exception as e:
-            logger.error(f"Failed to create tenant {tenant_config.id}: {e}")
-            raise
+            # Register whichever tenants were saved, even if some failed
+            await self.flush_registry()
+        
+        errors = [result for result in results if isinstance(result, Exception)]
+        logger.info(
+            "Bulk created %s tenants, %s failed", len(tenant_configs) - len(errors), len(errors)
+        )
+        if errors:
+            raise errors[0]
+        
+        return tenant_configs
     
     async def update_tenant(self, tenant_config: TenantConfig) -> TenantConfig:
         """Update existing tenant configuration."""
@@ -198,66 +379,83 @@ class TenantManager:
             raise RuntimeError("Key Vault client not available")
         
         # Validate tenant exists
-        if tenant_config.id not in self._cache:
+        if await self.get_tenant(tenant_config.id) is None:
             raise ValueError(f"Tenant not found: {tenant_config.id}")
         
         # Update timestamp
         tenant_config.updated_at = datetime.utcnow()
         
         # Save to Key Vault
-        secret_name = f"{self.TENANT_CONFIG_PREFIX}{tenant_config.id}{self.TENANT_CONFIG_SUFFIX}"
+        secret_name = self._secret_name(tenant_config.id)
         config_json = tenant_config.model_dump_json()
         
-        try:
-            self.kv_client.set_secret(secret_name, config_json)
-            logger.info(f"Updated tenant config: {tenant_config.id}")
-            
-            # Update cache
-            self._cache[tenant_config.id] = tenant_config
-            
-            return tenant_config
-        except Exception as e:
-            logger.error(f"Failed to update tenant {tenant_config.id}: {e}")
-            raise
+        async with self._registry_lock:
+            try:
+                await asyncio.to_thread(self.kv_client.set_secret, secret_name, config_json)
+                logger.info("Updated tenant config: %s", tenant_config.id)
+                
+                # Update cache
+                self._cache_put(tenant_config.id, tenant_config)
+                self._list_snapshot = None
+                
+                return tenant_config
+            except Exception as e:
+                logger.error("Failed to update tenant %s: %s", tenant_config.id, e)
+                raise
     
     async def delete_tenant(self, tenant_id: str) -> None:
         """Delete tenant configuration."""
         if self.kv_client is None:
             raise RuntimeError("Key Vault client not available")
         
-        secret_name = f"{self.TENANT_CONFIG_PREFIX}{tenant_id}{self.TENANT_CONFIG_SUFFIX}"
+        secret_name = self._secret_name(tenant_id)
         
-        try:
-            # Begin delete (soft delete with recovery option)
-            self.kv_client.begin_delete_secret(secret_name)
-            logger.info(f"Deleted tenant config: {tenant_id}")
-            
-            # Update registry
-            await self._remove_from_registry(tenant_id)
-            
-            # Update cache
-            if tenant_id in self._cache:
-                del self._cache[tenant_id]
-        except Exception as e:
-            logger.error(f"Failed to delete tenant {tenant_id}: {e}")
-            raise
+        async with self._registry_lock:
+            try:
+                # Begin delete (soft delete with recovery option)
+                await asyncio.to_thread(self.kv_client.begin_delete_secret, secret_name)
+                logger.info("Deleted tenant config: %s", tenant_id)
+                
+                # Update registry
+                self._remove_from_registry(tenant_id)
+                await self.flush_registry()
+                
+                # Update cache
+                self._cache.pop(tenant_id, None)
+                self._list_snapshot = None
+            except Exception as e:
+                logger.error("Failed to delete tenant %s: %s", tenant_id, e)
+                raise
     
-    async def _add_to_registry(self, tenant_id: str) -> None:
-        """Add tenant to registry."""
+    def _add_to_registry(self, tenant_id: str) -> None:
+        """Add tenant to the in-memory registry; persisted by flush_registry()."""
         if self._registry is None:
             self._registry = TenantRegistry(tenants=[])
         
         if tenant_id not in self._registry.tenants:
             self._registry.tenants.append(tenant_id)
             self._registry.updated_at = datetime.utcnow()
-            await self._save_registry()
+            self._registry_dirty = True
     
-    async def _remove_from_registry(self, tenant_id: str) -> None:
-        """Remove tenant from registry."""
+    def _remove_from_registry(self, tenant_id: str) -> None:
+        """Remove tenant from the in-memory registry; persisted by flush_registry()."""
         if self._registry and tenant_id in self._registry.tenants:
             self._registry.tenants.remove(tenant_id)
             self._registry.updated_at = datetime.utcnow()
+            self._registry_dirty = True
+    
+    async def flush_registry(self) -> None:
+        """Write the registry to Key Vault if it has unsaved changes."""
+        if not self._registry_dirty:
+            return
+        
+        # Cleared first so changes made while saving mark it dirty again
+        self._registry_dirty = False
+        try:
             await self._save_registry()
+        except Exception:
+            self._registry_dirty = True
+            raise
     
     async def _save_registry(self) -> None:
         """Save tenant registry to Key Vault."""
@@ -266,10 +464,12 @@ class TenantManager:
         
         try:
             registry_json = self._registry.model_dump_json()
-            self.kv_client.set_secret(self.REGISTRY_SECRET_NAME, registry_json)
+            await asyncio.to_thread(
+                self.kv_client.set_secret, self.REGISTRY_SECRET_NAME, registry_json
+            )
             logger.debug("Saved tenant registry")
         except Exception as e:
-            logger.error(f"Failed to save tenant registry: {e}")
+            logger.error("Failed to save tenant registry: %s", e)
             raise
     
     def is_cache_valid(self) -> bool:
@@ -277,8 +477,7 @@ class TenantManager:
         if self._cache_timestamp is None:
             return False
         
-        age = (datetime.utcnow() - self._cache_timestamp).total_seconds()
-        return age < self._cache_ttl
+        return time.monotonic() - self._cache_timestamp < self._cache_ttl
     
     async def validate_tenant(self, tenant_id: str) -> bool:
         """Validate if tenant exists and is enabled."""
@@ -290,4 +489,14 @@ class TenantManager:
     
     def get_cached_tenant_count(self) -> int:
         """Get number of cached tenants."""
-        return len(self._cache)
+        return sum(1 for _, config in self._cache.values() if config is not None)
+    
+    async def close(self) -> None:
+        """Stop background refresh and close the Key Vault client if it was built here."""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+        
+        if self._owns_client and self.kv_client is not None:
+            await asyncio.to_thread(self.kv_client.close)
+            logger.info("Tenant manager Key Vault client closed")
@@ -2,9 +2,13 @@
 Auto-discovery service for DataAgents and knowledge sources.
 Scans FoundryIQ, Fabric, SharePoint, OneLake for available sources.
 """
+import asyncio
 import logging
 from datetime import datetime
-from typing import Dict, List
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import httpx
 
 from ..config import Settings
 from ..models.agent import DataSource, DiscoveryResult, SourceType
@@ -12,6 +16,84 @@ from ..models.agent import DataSource, DiscoveryResult, SourceType
 logger = logging.getLogger(__name__)
 
 
+# Mock discovery results are static, so they are built once and reused.
+# discovered_at is stamped when the cache is first filled.
+@lru_cache()
+def _fabric_mock_sources(foundry_api_base: str) -> Tuple[DataSource, ...]:
+    """Mock Fabric Data Agents for local development."""
+    discovered_at = datetime.utcnow()
+    return (
+        DataSource(
+            id="fabric-data-agent-sales",
+            name="Sales Data Agent",
+            type=SourceType.FABRIC_DATA_AGENT,
+            description="Access to sales database with revenue, orders, and customer data",
+            endpoint=f"{foundry_api_base}/agents/sales",
+            discovered_at=discovered_at,
+            enabled=True,
+            metadata={
+                "tables": ["orders", "customers", "products"],
+                "schema": "sales"
+            }
+        ),
+        DataSource(
+            id="fabric-data-agent-inventory",
+            name="Inventory Data Agent",
+            type=SourceType.FABRIC_DATA_AGENT,
+            description="Access to inventory database with stock levels, warehouses, and SKUs",
+            endpoint=f"{foundry_api_base}/agents/inventory",
+            discovered_at=discovered_at,
+            enabled=True,
+            metadata={
+                "tables": ["inventory", "warehouses", "products"],
+                "schema": "inventory"
+            }
+        )
+    )
+
+
+@lru_cache()
+def _sharepoint_mock_sources() -> Tuple[DataSource, ...]:
+    """Mock SharePoint sites for local development."""
+    discovered_at = datetime.utcnow()
+    return (
+        DataSource(
+            id="sharepoint-site-marketing",
+            name="Marketing SharePoint Site",
+            type=SourceType.SHAREPOINT,
+            description="Marketing documents, campaigns, and presentations",
+            endpoint="https://contoso.sharepoint.com/sites/marketing",
+            discovered_at=discovered_at,
+            enabled=True,
+            metadata={
+                "site_url": "https://contoso.sharepoint.com/sites/marketing",
+                "document_libraries": ["Documents", "Campaigns"]
+            }
+        ),
+    )
+
+
+@lru_cache()
+def _onelake_mock_sources(foundry_api_base: str) -> Tuple[DataSource, ...]:
+    """Mock OneLake sources for local development."""
+    discovered_at = datetime.utcnow()
+    return (
+        DataSource(
+            id="onelake-analytics",
+            name="Analytics OneLake",
+            type=SourceType.ONELAKE,
+            description="Analytics data lake with aggregated business metrics",
+            endpoint=f"{foundry_api_base}/onelake/analytics",
+            discovered_at=discovered_at,
+            enabled=True,
+            metadata={
+                "workspace": "analytics",
+                "lakehouse": "business-metrics"
+            }
+        ),
+    )
+
+
 class DiscoveryService:
     """Auto-discovers DataAgents and knowledge sources."""
     
@@ -19,6 +101,16 @@ class DiscoveryService:
         """Initialize discovery service."""
         self.settings = settings
         self._discovered_sources: List[DataSource] = []
+        
+        # Shared pooled client for the real discovery APIs; the probes should
+        # use this rather than opening a client per call
+        self._http: Optional[httpx.AsyncClient] = None
+        if not settings.local_mock_services:
+            self._http = httpx.AsyncClient(
+                http2=True,
+                timeout=httpx.Timeout(10.0, connect=5.0),
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+            )
     
     async def discover_all_sources(self) -> DiscoveryResult:
         """
@@ -27,38 +119,28 @@ class DiscoveryService:
         """
         logger.info("Starting auto-discovery of data sources")
         
+        # The probes are independent, so run them concurrently
+        probes = (
+            ("Fabric Data Agents", self._discover_fabric_data_agents()),
+            ("SharePoint sites", self._discover_sharepoint_sites()),
+            ("OneLake sources", self._discover_onelake_sources()),
+        )
+        results = await asyncio.gather(
+            *(probe for _, probe in probes),
+            return_exceptions=True
+        )
+        
         sources_found = []
         errors = []
         
-        try:
-            # Discover Fabric Data Agents
-            fabric_sources = await self._discover_fabric_data_agents()
-            sources_found.extend(fabric_sources)
-            logger.info(f"Discovered {len(fabric_sources)} Fabric Data Agents")
-        except Exception as e:
-            error_msg = f"Failed to discover Fabric Data Agents: {e}"
-            logger.error(error_msg)
-            errors.append(error_msg)
-        
-        try:
-            # Discover SharePoint sites
-            sharepoint_sources = await self._discover_sharepoint_sites()
-            sources_found.extend(sharepoint_sources)
-            logger.info(f"Discovered {len(sharepoint_sources)} SharePoint sites")
-        except Exception as e:
-            error_msg = f"Failed to discover SharePoint sites: {e}"
-            logger.error(error_msg)
-            errors.append(error_msg)
-        
-        try:
-            # Discover OneLake sources
-            onelake_sources = await self._discover_onelake_sources()
-            sources_found.extend(onelake_sources)
-            logger.info(f"Discovered {len(onelake_sources)} OneLake sources")
-        except Exception as e:
-            error_msg = f"Failed to discover OneLake sources: {e}"
-            logger.error(error_msg)
-            errors.append(error_msg)
+        for (label, _), result in zip(probes, results):
+            if isinstance(result, Exception):
+                error_msg = f"Failed to discover {label}: {result}"
+                logger.error(error_msg)
+                errors.append(error_msg)
+            else:
+                sources_found.extend(result)
+                logger.info("Discovered %s %s", len(result), label)
         
         # Store discovered sources
         self._discovered_sources = sources_found
@@ -72,8 +154,9 @@ class DiscoveryService:
         )
         
         logger.info(
-            f"Discovery complete: {result.sources_found} sources found, "
-            f"{len(errors)} errors"
+            "Discovery complete: %s sources found, %s errors",
+            result.sources_found,
+            len(errors)
         )
         
         return result
@@ -84,34 +167,7 @@ class DiscoveryService:
         # For now, return mock data for development
         
         if self.settings.local_mock_services:
-            return [
-                DataSource(
-                    id="fabric-data-agent-sales",
-                    name="Sales Data Agent",
-                    type=SourceType.FABRIC_DATA_AGENT,
-                    description="Access to sales database with revenue, orders, and customer data",
-                    endpoint=f"{self.settings.foundry_api_base}/agents/sales",
-                    discovered_at=datetime.utcnow(),
-                    enabled=True,
-                    metadata={
-                        "tables": ["orders", "customers", "products"],
-                        "schema": "sales"
-                    }
-                ),
-                DataSource(
-                    id="fabric-data-agent-inventory",
-                    name="Inventory Data Agent",
-                    type=SourceType.FABRIC_DATA_AGENT,
-                    description="Access to inventory database with stock levels, warehouses, and SKUs",
-                    endpoint=f"{self.settings.foundry_api_base}/agents/inventory",
-                    discovered_at=datetime.utcnow(),
-                    enabled=True,
-                    metadata={
-                        "tables": ["inventory", "warehouses", "products"],
-                        "schema": "inventory"
-                    }
-                )
-            ]
+            return list(_fabric_mock_sources(self.settings.foundry_api_base))
         
         # Placeholder for actual implementation
         logger.warning("Fabric Data Agent discovery not yet implemented")
@@ -122,21 +178,7 @@ class DiscoveryService:
         # TODO: Implement actual SharePoint API discovery via Microsoft Graph
         
         if self.settings.local_mock_services:
-            return [
-                DataSource(
-                    id="sharepoint-site-marketing",
-                    name="Marketing SharePoint Site",
-                    type=SourceType.SHAREPOINT,
-                    description="Marketing documents, campaigns, and presentations",
-                    endpoint="https://contoso.sharepoint.com/sites/marketing",
-                    discovered_at=datetime.utcnow(),
-                    enabled=True,
-                    metadata={
-                        "site_url": "https://contoso.sharepoint.com/sites/marketing",
-                        "document_libraries": ["Documents", "Campaigns"]
-                    }
-                )
-            ]
+            return list(_sharepoint_mock_sources())
         
         logger.warning("SharePoint discovery not yet implemented")
         return []
@@ -146,25 +188,17 @@ class DiscoveryService:
         # TODO: Implement actual OneLake API discovery
         
         if self.settings.local_mock_services:
-            return [
-                DataSource(
-                    id="onelake-analytics",
-                    name="Analytics OneLake",
-                    type=SourceType.ONELAKE,
-                    description="Analytics data lake with aggregated business metrics",
-                    endpoint=f"{self.settings.foundry_api_base}/onelake/analytics",
-                    discovered_at=datetime.utcnow(),
-                    enabled=True,
-                    metadata={
-                        "workspace": "analytics",
-                        "lakehouse": "business-metrics"
-                    }
-                )
-            ]
+            return list(_onelake_mock_sources(self.settings.foundry_api_base))
         
         logger.warning("OneLake discovery not yet implemented")
         return []
     
+    async def close(self) -> None:
+        """Close HTTP client."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+    
     def get_discovered_sources(self) -> List[DataSource]:
         """Get list of discovered sources."""
         return self._discovered_sources.copy()
@@ -172,14 +206,14 @@ class DiscoveryService:
     async def test_source_connection(self, source: DataSource) -> bool:
         """Test connection to a data source."""
         # TODO: Implement actual connection testing
-        logger.info(f"Testing connection to source: {source.id}")
+        logger.info("Testing connection to source: %s", source.id)
         
         try:
             # Placeholder for actual connection test
             # Would make actual API call to verify source is accessible
             return True
         except Exception as e:
-            logger.error(f"Connection test failed for {source.id}: {e}")
+            logger.error("Connection test failed for %s: %s", source.id, e)
             return False
 
 
@@ -199,4 +233,7 @@ async def run_discovery(settings: Settings) -> DiscoveryResult:
         )
     
     service = DiscoveryService(settings)
-    return await service.discover_all_sources()
+    try:
+        return await service.discover_all_sources()
+    finally:
+        await service.close()
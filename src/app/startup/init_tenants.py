@@ -2,30 +2,47 @@
 Initialization script for seeding tenant configurations from YAML to Key Vault.
 Runs on application startup (idempotent).
 """
-import json
+import asyncio
 import logging
 from datetime import datetime
-from typing import Dict, List
+from typing import TYPE_CHECKING, Dict, List, Optional, Set
 
-from azure.core.exceptions import ResourceNotFoundError
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
+from pydantic import TypeAdapter
 
 from ..config import Settings, get_tenants_config
 from ..models.tenant import TenantConfig, TenantRegistry
+from ..services.azure_auth import get_credential
+
+if TYPE_CHECKING:
+    from azure.keyvault.secrets import SecretClient
 
 logger = logging.getLogger(__name__)
 
+# Validators built once; validate_json parses secret payloads in pydantic-core
+_TENANT_CONFIG_ADAPTER = TypeAdapter(TenantConfig)
+_TENANT_REGISTRY_ADAPTER = TypeAdapter(TenantRegistry)
+
 
 class TenantInitializer:
     """Initializes tenant configurations from YAML to Key Vault."""
     
-    def __init__(self, settings: Settings):
-        """Initialize tenant initializer."""
+    def __init__(self, settings: Settings, kv_client: Optional["SecretClient"] = None):
+        """
+        Initialize tenant initializer.
+        
+        Args:
+            settings: Application settings
+            kv_client: Existing Key Vault client to share; built from settings if omitted
+        """
         self.settings = settings
+        self._owns_client = kv_client is None
         
-        if settings.key_vault_url and not settings.local_mock_services:
-            credential = DefaultAzureCredential()
+        if kv_client is not None:
+            self.kv_client = kv_client
+        elif settings.key_vault_url and not settings.local_mock_services:
+            from azure.keyvault.secrets import SecretClient
+            
+            credential = get_credential()
             self.kv_client = SecretClient(
                 vault_url=settings.key_vault_url,
                 credential=credential
@@ -56,6 +73,9 @@ class TenantInitializer:
             # Load or create registry
             registry = await self._load_or_create_registry()
             
+            # One listing call answers "exists?" for every tenant
+            existing_secrets = await asyncio.to_thread(self._list_tenant_secret_names)
+            
             # Process each tenant
             results = {
                 "created": [],
@@ -68,13 +88,13 @@ class TenantInitializer:
                     tenant_id = tenant_data["id"]
                     
                     # Check if tenant already exists
-                    if await self._tenant_exists(tenant_id):
-                        logger.debug(f"Tenant already exists, skipping: {tenant_id}")
+                    if f"tenant-{tenant_id}-config" in existing_secrets:
+                        logger.debug("Tenant already exists, skipping: %s", tenant_id)
                         results["skipped"].append(tenant_id)
                         continue
                     
                     # Create tenant config
-                    tenant_config = TenantConfig(**tenant_data)
+                    tenant_config = _TENANT_CONFIG_ADAPTER.validate_python(tenant_data)
                     
                     # Save to Key Vault
                     await self._save_tenant_config(tenant_config)
@@ -84,7 +104,7 @@ class TenantInitializer:
                         registry.tenants.append(tenant_id)
                     
                     results["created"].append(tenant_id)
-                    logger.info(f"Initialized tenant: {tenant_id}")
+                    logger.info("Initialized tenant: %s", tenant_id)
                     
                 except Exception as e:
                     error_msg = f"Failed to initialize tenant {tenant_data.get('id', 'unknown')}: {e}"
@@ -97,10 +117,10 @@ class TenantInitializer:
                 await self._save_registry(registry)
             
             logger.info(
-                f"Tenant initialization complete: "
-                f"{len(results['created'])} created, "
-                f"{len(results['skipped'])} skipped, "
-                f"{len(results['errors'])} errors"
+                "Tenant initialization complete: %s created, %s skipped, %s errors",
+                len(results["created"]),
+                len(results["skipped"]),
+                len(results["errors"])
             )
             
             return {
@@ -109,7 +129,7 @@ class TenantInitializer:
             }
             
         except Exception as e:
-            logger.error(f"Tenant initialization failed: {e}")
+            logger.error("Tenant initialization failed: %s", e)
             return {
                 "status": "failed",
                 "error": str(e)
@@ -117,39 +137,50 @@ class TenantInitializer:
     
     async def _load_or_create_registry(self) -> TenantRegistry:
         """Load existing registry or create new one."""
+        from azure.core.exceptions import ResourceNotFoundError
+        
         try:
-            secret = self.kv_client.get_secret("tenant-registry")
-            registry_data = json.loads(secret.value)
-            return TenantRegistry(**registry_data)
+            secret = await asyncio.to_thread(self.kv_client.get_secret, "tenant-registry")
+            return _TENANT_REGISTRY_ADAPTER.validate_json(secret.value)
         except ResourceNotFoundError:
             logger.info("Creating new tenant registry")
             return TenantRegistry(tenants=[])
     
-    async def _tenant_exists(self, tenant_id: str) -> bool:
-        """Check if tenant config exists in Key Vault."""
-        secret_name = f"tenant-{tenant_id}-config"
-        try:
-            self.kv_client.get_secret(secret_name)
-            return True
-        except ResourceNotFoundError:
-            return False
+    def _list_tenant_secret_names(self) -> Set[str]:
+        """List the names of all tenant config secrets in Key Vault (blocking)."""
+        return {
+            properties.name
+            for properties in self.kv_client.list_properties_of_secrets()
+            if properties.name.startswith("tenant-") and properties.name.endswith("-config")
+        }
     
     async def _save_tenant_config(self, tenant_config: TenantConfig) -> None:
         """Save tenant configuration to Key Vault."""
         secret_name = f"tenant-{tenant_config.id}-config"
         config_json = tenant_config.model_dump_json()
-        self.kv_client.set_secret(secret_name, config_json)
+        await asyncio.to_thread(self.kv_client.set_secret, secret_name, config_json)
     
     async def _save_registry(self, registry: TenantRegistry) -> None:
         """Save tenant registry to Key Vault."""
         registry_json = registry.model_dump_json()
-        self.kv_client.set_secret("tenant-registry", registry_json)
+        await asyncio.to_thread(self.kv_client.set_secret, "tenant-registry", registry_json)
 
 
-async def init_tenants_from_config(settings: Settings) -> Dict[str, any]:
+async def init_tenants_from_config(
+    settings: Settings,
+    kv_client: Optional["SecretClient"] = None
+) -> Dict[str, any]:
     """
     Convenience function to initialize tenants from config.
     Called during application startup.
+    
+    Args:
+        settings: Application settings
+        kv_client: Shared Key Vault client; left open for its owner to close
     """
-    initializer = TenantInitializer(settings)
-    return await initializer.initialize_tenants()
+    initializer = TenantInitializer(settings, kv_client=kv_client)
+    try:
+        return await initializer.initialize_tenants()
+    finally:
+        if initializer._owns_client and initializer.kv_client is not None:
+            await asyncio.to_thread(initializer.kv_client.close)
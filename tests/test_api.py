@@ -1,44 +1,51 @@
 """
 Basic tests for the FastAPI backend
 """
+import httpx
 import pytest
-from fastapi.testclient import TestClient
+import pytest_asyncio
 
 from app.main import app
 
-client = TestClient(app)
 
+@pytest_asyncio.fixture
+async def client():
+    """Async client running the app in-process on the test's event loop"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        yield c
 
-def test_health_check():
+
+async def test_health_check(client):
     """Test health endpoint"""
-    response = client.get("/health")
+    response = await client.get("/health")
     assert response.status_code == 200
     data = response.json()
     assert data["status"] == "healthy"
     assert "version" in data
 
 
-def test_root_endpoint():
+async def test_root_endpoint(client):
     """Test root endpoint"""
-    response = client.get("/")
+    response = await client.get("/")
     assert response.status_code == 200
     data = response.json()
     assert "name" in data
     assert "version" in data
 
 
-def test_list_agents():
+async def test_list_agents(client):
     """Test listing agents"""
-    response = client.get("/api/agents", headers={"X-Tenant-ID": "default"})
+    response = await client.get("/api/agents", headers={"X-Tenant-ID": "default"})
     assert response.status_code == 200
     data = response.json()
     assert "agents" in data
     assert "total" in data
 
 
-def test_chat_message():
+async def test_chat_message(client):
     """Test sending a chat message"""
-    response = client.post(
+    response = await client.post(
         "/api/chat",
         headers={"X-Tenant-ID": "default"},
         json={"message": "Hello, how can you help?"}
@@ -0,0 +1,112 @@
+"""
+Tests for the Redis rate limiter and its local admission cache
+"""
+import uuid
+
+import fakeredis
+import pytest_asyncio
+
+from app.config import Settings
+from app.services import rate_limiter as rate_limiter_module
+from app.services.rate_limiter import _CHECK_AND_RECORD_LUA, RateLimiter
+
+
+@pytest_asyncio.fixture
+async def limiter():
+    """Rate limiter backed by an in-memory Redis with Lua support"""
+    limiter = RateLimiter(Settings(LOCAL_MOCK_SERVICES=True))
+    limiter.redis_client = fakeredis.FakeAsyncRedis()
+    limiter._check_and_record_script = limiter.redis_client.register_script(
+        _CHECK_AND_RECORD_LUA
+    )
+    yield limiter
+    await limiter.redis_client.aclose()
+
+
+async def test_local_admissions_are_flushed_to_redis(limiter):
+    """Test requests admitted in-process reach Redis on flush"""
+    # The first request syncs with Redis, the next ones are admitted locally
+    for _ in range(5):
+        assert await limiter.check_and_record("acme", 100, 1000) == (True, None)
+    assert limiter._local["acme"].pending == 4
+    assert (await limiter.get_usage_stats("acme"))["rpd"] == 1
+
+    await limiter.flush()
+
+    assert limiter._local["acme"].pending == 0
+    stats = await limiter.get_usage_stats("acme")
+    assert stats["rpm"] == 5
+    assert stats["rpd"] == 5
+
+
+async def test_stale_local_admissions_skip_the_rpm_window(limiter):
+    """Test admissions older than a minute count towards quotas but not RPM"""
+    await limiter.check_and_record("acme", 100, 1000)
+    await limiter.check_and_record("acme", 100, 1000)
+    entry = limiter._local["acme"]
+    entry.pending_ms -= 120_000
+
+    await limiter.flush()
+
+    stats = await limiter.get_usage_stats("acme")
+    assert stats["rpm"] == 1
+    assert stats["rpd"] == 2
+
+
+async def test_evicted_tenant_is_flushed(limiter, monkeypatch):
+    """Test the least recently synced tenant is flushed when the cache is full"""
+    monkeypatch.setattr(rate_limiter_module, "LOCAL_CACHE_SIZE", 1)
+    await limiter.check_and_record("acme", 100, 1000)
+    await limiter.check_and_record("acme", 100, 1000)
+    assert limiter._local["acme"].pending == 1
+
+    await limiter.check_and_record("globex", 100, 1000)
+
+    assert list(limiter._local) == ["globex"]
+    assert (await limiter.get_usage_stats("acme"))["rpd"] == 2
+
+
+async def test_close_flushes_pending_admissions(limiter):
+    """Test pending admissions are not lost at shutdown"""
+    await limiter.check_and_record("acme", 100, 1000)
+    await limiter.check_and_record("acme", 100, 1000)
+
+    await limiter.close()
+
+    assert (await limiter.get_usage_stats("acme"))["rpd"] == 2
+
+
+async def run_script(limiter, limits, pending=0):
+    """Call the fused check/record script for tenant "acme" without local admission"""
+    keys = ["ratelimit:rpm-window:acme", "ratelimit:rpd:acme:1"]
+    now_ms = 1_700_000_000_000
+    return await limiter._check_and_record_script(
+        keys=keys + ["ratelimit:index:acme"],
+        args=limits + [60, 86400] + [3600, pending, now_ms, now_ms, uuid.uuid4().hex]
+    )
+
+
+async def test_script_records_until_limit(limiter):
+    """Test the script admits and counts requests until a limit is reached"""
+    assert await run_script(limiter, [2, 10]) == [0, 1, 1]
+    assert await run_script(limiter, [2, 10]) == [0, 2, 2]
+
+    # Denied requests are reported against the RPM limit and not recorded
+    assert await run_script(limiter, [2, 10]) == [1, 2, 2]
+    assert await limiter.redis_client.ttl("ratelimit:rpd:acme:1") > 0
+    assert await limiter.redis_client.smembers("ratelimit:index:acme") == {
+        b"ratelimit:rpm-window:acme",
+        b"ratelimit:rpd:acme:1"
+    }
+
+
+async def test_script_reports_daily_quota(limiter):
+    """Test the script reports the first exceeded counter"""
+    assert await run_script(limiter, [10, 1]) == [0, 1, 1]
+    assert await run_script(limiter, [10, 1]) == [2, 1, 1]
+
+
+async def test_script_applies_pending_before_checking(limiter):
+    """Test locally admitted requests count before the new request is checked"""
+    assert await run_script(limiter, [5, 10], pending=4) == [0, 5, 5]
+    assert await run_script(limiter, [5, 10]) == [1, 5, 5]
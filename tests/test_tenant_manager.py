@@ -0,0 +1,118 @@
+"""
+Tests for the tenant manager's config cache
+"""
+from types import SimpleNamespace
+
+import pytest
+from azure.core.exceptions import ResourceNotFoundError
+
+from app.config import Settings
+from app.models.tenant import TenantConfig
+from app.services import tenant_manager as tenant_manager_module
+from app.services.tenant_manager import TenantManager
+
+
+class FakeSecretClient:
+    """In-memory stand-in for the Key Vault SecretClient"""
+
+    def __init__(self):
+        self.secrets = {}
+        self.closed = False
+
+    def get_secret(self, name):
+        if name not in self.secrets:
+            raise ResourceNotFoundError(f"{name} not found")
+        return SimpleNamespace(value=self.secrets[name])
+
+    def set_secret(self, name, value):
+        self.secrets[name] = value
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClock:
+    """Controllable replacement for the time module's monotonic()"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(tenant_manager_module, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def kv_client():
+    return FakeSecretClient()
+
+
+@pytest.fixture
+def manager(kv_client):
+    return TenantManager(Settings(LOCAL_MOCK_SERVICES=True), kv_client=kv_client)
+
+
+def make_tenant(tenant_id):
+    return TenantConfig(
+        id=tenant_id,
+        name=tenant_id,
+        foundry_endpoint="https://foundry.test",
+        admin_contact="admin@example.com"
+    )
+
+
+def test_cache_entry_expires_after_ttl(manager, clock):
+    """Test positive entries are served until the TTL and then evicted"""
+    tenant = make_tenant("acme")
+    manager._cache_put("acme", tenant)
+
+    clock.now += manager._cache_ttl - 1
+    assert manager._cache_get("acme") == (True, tenant)
+
+    clock.now += 1
+    assert manager._cache_get("acme") == (False, None)
+    assert "acme" not in manager._cache
+
+
+def test_negative_entry_uses_shorter_ttl(manager, clock):
+    """Test cached misses expire after the negative TTL"""
+    manager._cache_put("missing", None)
+    assert manager._cache_get("missing") == (True, None)
+
+    clock.now += tenant_manager_module.NEGATIVE_CACHE_TTL_SECONDS
+    assert manager._cache_get("missing") == (False, None)
+
+
+def test_cache_evicts_least_recently_used(manager, clock, monkeypatch):
+    """Test the cache drops the least recently used entry when full"""
+    monkeypatch.setattr(tenant_manager_module, "TENANT_CACHE_MAXSIZE", 2)
+    manager._cache_put("a", make_tenant("a"))
+    manager._cache_put("b", make_tenant("b"))
+
+    # Touch "a" so "b" becomes the eviction candidate
+    manager._cache_get("a")
+    manager._cache_put("c", make_tenant("c"))
+
+    assert list(manager._cache) == ["a", "c"]
+
+
+async def test_create_rejects_existing_tenant_after_cache_expiry(manager, kv_client, clock):
+    """Test create_tenant checks Key Vault, not just the cache, for duplicates"""
+    await manager.create_tenant(make_tenant("acme"))
+
+    clock.now += manager._cache_ttl
+    with pytest.raises(ValueError, match="already exists"):
+        await manager.create_tenant(make_tenant("acme"))
+
+
+async def test_close_leaves_shared_client_open(manager, kv_client):
+    """Test close() only closes a Key Vault client the manager built itself"""
+    await manager.close()
+
+    assert not kv_client.closed